@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ============================================================================
+# ANOMALY DETECTION
+# ============================================================================
+# Rolling robust z-scores computed for every series at once on a
+# (series x periods) matrix. The baseline is a centered rolling median and the
+# scale is the MAD of each series' residuals around it. Series shorter than
+# two windows fall back to whole-series median/MAD, since a rolling median
+# over 2-3 points is noise.
+
+DEFAULT_WINDOW = 5
+# Iglewicz & Hoaglin suggest 3.5; with six months of history that misses the
+# May spikes (boychoy scores 3.1), so the default is a little tighter.
+DEFAULT_THRESHOLD = 3.0
+MAD_SCALE = 0.6745
+
+
+def series_matrix(df, key_col, value_col, period_col='period'):
+    """Pivot long data into a series x periods matrix"""
+    return df.pivot_table(index=key_col, columns=period_col, values=value_col, aggfunc='sum').sort_index(axis=1)
+
+
+def robust_zscores(values, window=DEFAULT_WINDOW):
+    """Modified z-score of every point against a robust baseline
+
+    Returns (z, baseline) arrays shaped like values. Series with no spread
+    (MAD of 0) or missing points get a z-score of 0.
+    """
+    x = np.asarray(values, dtype=float)
+    with warnings.catch_warnings():
+        # All-NaN rows are expected for series that start late
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if x.shape[1] < 2 * window:
+            median = np.broadcast_to(np.nanmedian(x, axis=1, keepdims=True), x.shape)
+        else:
+            half = window // 2
+            padded = np.pad(x, ((0, 0), (half, window - 1 - half)), constant_values=np.nan)
+            median = np.nanmedian(sliding_window_view(padded, window, axis=1), axis=2)
+        mad = np.nanmedian(np.abs(x - median), axis=1, keepdims=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = MAD_SCALE * (x - median) / mad
+    z = np.where(np.isfinite(z), z, 0.0)
+    return z, np.array(median)
+
+
+def detect_anomalies(matrix, threshold=DEFAULT_THRESHOLD, window=DEFAULT_WINDOW):
+    """Flag outliers in a series x periods matrix
+
+    Returns (flags, zscores, baseline) DataFrames aligned with matrix.
+    """
+    z, baseline = robust_zscores(matrix.to_numpy(), window)
+    z = pd.DataFrame(z, index=matrix.index, columns=matrix.columns)
+    baseline = pd.DataFrame(baseline, index=matrix.index, columns=matrix.columns)
+    flags = (z.abs() > threshold) & matrix.notna()
+    return flags, z, baseline
+
+
+def clean_series(matrix, flags, baseline):
+    """Replace flagged points with their robust baseline"""
+    return matrix.mask(flags, baseline)
+
+
+def anomaly_table(matrix, flags, zscores, baseline, series_type):
+    """Long table of flagged points"""
+    stacked = flags.stack()
+    hits = stacked[stacked].index
+    if len(hits) == 0:
+        return pd.DataFrame(columns=['series_type', 'series', 'period', 'value', 'baseline', 'z_score'])
+    return pd.DataFrame({
+        'series_type': series_type,
+        'series': hits.get_level_values(0),
+        'period': hits.get_level_values(1),
+        'value': [matrix.at[k, p] for k, p in hits],
+        'baseline': [baseline.at[k, p] for k, p in hits],
+        'z_score': [zscores.at[k, p] for k, p in hits],
+    })
+
@@ -0,0 +1,225 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+# ============================================================================
+# CHART BUILDERS AND PREBUILT LAYOUTS
+# ============================================================================
+# dashboard.py imports this module the first time a page draws a chart, which
+# keeps plotly.express (the slowest import in the app) off the startup path.
+# Layouts are module constants built once per process, and the dashboard
+# caches each built figure per data version, so a rerun reuses the figure
+# instead of rebuilding it. A plotly.express figure costs ~35ms to build;
+# drawing a cached one costs ~2ms.
+
+LEGEND_RIGHT = dict(orientation="v", yanchor="middle", y=0.5, xanchor="left", x=1.05)
+LEGEND_BELOW = dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5)
+LEGEND_ABOVE = dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+OUTLINE = dict(line=dict(color='#000000', width=1))
+
+LAYOUTS = {
+    'orders_trend': dict(height=350, showlegend=False, yaxis_title="Number of Orders", xaxis_title="Month"),
+    'revenue_trend': dict(height=350, showlegend=False, yaxis_title="Revenue ($)", xaxis_title="Month"),
+    'top_categories': dict(height=400, showlegend=False, xaxis_title="Category", yaxis_title="Number of Orders"),
+    'category_trend': dict(height=450, legend_title_text='Category'),
+    'category_pie': dict(height=400, showlegend=True, legend=LEGEND_RIGHT),
+    'item_rank': dict(height=450, yaxis_title=""),
+    'alert_pie': dict(height=350, showlegend=True, legend=LEGEND_BELOW),
+    'depletion_histogram': dict(height=350, xaxis_title="Days Until Empty", yaxis_title="Number of Ingredients", showlegend=False),
+    'top_usage': dict(height=500, showlegend=False, yaxis_title="", xaxis_title="Total Historical Usage"),
+    'shipment_frequency': dict(height=400, xaxis_tickangle=-45, showlegend=False, yaxis_title="Shipments per Month"),
+    'shipment_quantity': dict(height=400, xaxis_tickangle=-45, showlegend=False, yaxis_title="Average Quantity (g)"),
+    'delivery_calendar': dict(height=350),
+    'forecast': dict(height=450, hovermode='x unified', xaxis_title="Period", legend=LEGEND_ABOVE),
+    'usage_heatmap': dict(height=600),
+}
+
+
+def trend_line(x, y, color, layout, name=None, fill=None):
+    """Single line-and-marker series"""
+    fig = go.Figure(go.Scatter(
+        x=x,
+        y=y,
+        mode='lines+markers',
+        line=dict(color=color, width=3),
+        marker=dict(size=8),
+        fill=fill,
+        name=name
+    ))
+    fig.update_layout(LAYOUTS[layout])
+    return fig
+
+
+def colored_bar(df, x, y, color_scale, labels, layout, orientation=None):
+    """Bar chart colored by its own value"""
+    value = x if orientation == 'h' else y
+    fig = px.bar(df, x=x, y=y, orientation=orientation, color=value,
+                 color_continuous_scale=color_scale, labels=labels)
+    fig.update_layout(LAYOUTS[layout])
+    return fig
+
+
+def category_lines(df):
+    """Orders over time, one line per category"""
+    fig = px.line(df, x='period', y='count', color='group',
+                  labels={'count': 'Number of Orders', 'period': 'Month', 'group': 'Category'})
+    fig.update_layout(LAYOUTS['category_trend'])
+    return fig
+
+
+def share_pie(labels, values, layout, font_size=12):
+    """Donut chart with label and percent on each slice"""
+    fig = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=values,
+        hole=0.3,
+        textinfo='label+percent',
+        textposition='auto',
+        textfont=dict(size=font_size),
+        marker=OUTLINE
+    )])
+    fig.update_layout(LAYOUTS[layout])
+    return fig
+
+
+def depletion_histogram(days):
+    """Distribution of days until depletion"""
+    fig = go.Figure(data=[go.Histogram(x=days, nbinsx=20, marker=dict(color='#1f77b4', **OUTLINE))])
+    fig.update_layout(LAYOUTS['depletion_histogram'])
+    return fig
+
+
+def ranked_bar(df, metric, metric_label):
+    """Horizontal item ranking, colored by category, first row on top"""
+    fig = px.bar(df.iloc[::-1], x=metric, y='item', orientation='h', color='category',
+                 labels={metric: metric_label, 'item': 'Item', 'category': 'Category'})
+    fig.update_layout(LAYOUTS['item_rank'], xaxis_title=metric_label)
+    return fig
+
+
+def delivery_calendar_heatmap(calendar):
+    """Supplier x week grid of delivery drops"""
+    fig = px.imshow(
+        calendar,
+        x=[d.strftime('%b %d') for d in calendar.columns],
+        y=calendar.index,
+        color_continuous_scale='Blues',
+        aspect='auto',
+        text_auto=True,
+        labels=dict(x="Week Starting", y="Supplier", color="Deliveries")
+    )
+    fig.update_layout(LAYOUTS['delivery_calendar'])
+    return fig
+
+
+def forecast_chart(history, flagged, cleaned, forecast, avg_usage, unit):
+    """History, anomalies, interval bands, forecast, average and trend for one ingredient
+
+    flagged and cleaned may be None; forecast may be empty.
+    """
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=history['period'],
+        y=history['value'],
+        mode='lines+markers',
+        name='Historical',
+        line=dict(color='#1f77b4', width=3),
+        marker=dict(size=10)
+    ))
+
+    if flagged is not None and not flagged.empty:
+        fig.add_trace(go.Scatter(
+            x=flagged['period'],
+            y=flagged['value'],
+            mode='markers',
+            name='Anomaly',
+            marker=dict(size=16, color='red', symbol='x')
+        ))
+        if cleaned is not None:
+            fig.add_trace(go.Scatter(
+                x=cleaned.index,
+                y=cleaned.to_numpy(),
+                mode='lines',
+                name='Cleaned',
+                line=dict(color='#9467bd', width=2, dash='dot')
+            ))
+
+    # Prediction interval bands, widest first so the 80% band draws on top
+    if not forecast.empty and 'upper_95' in forecast.columns:
+        for level, color in [(95, 'rgba(255, 127, 14, 0.12)'), (80, 'rgba(255, 127, 14, 0.25)')]:
+            fig.add_trace(go.Scatter(
+                x=forecast['period'],
+                y=forecast[f'upper_{level}'],
+                mode='lines',
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo='skip'
+            ))
+            fig.add_trace(go.Scatter(
+                x=forecast['period'],
+                y=forecast[f'lower_{level}'],
+                mode='lines',
+                line=dict(width=0),
+                fill='tonexty',
+                fillcolor=color,
+                name=f'{level}% Interval'
+            ))
+
+    if not forecast.empty:
+        fig.add_trace(go.Scatter(
+            x=forecast['period'],
+            y=forecast['forecasted_usage'],
+            mode='lines+markers',
+            name='Forecast',
+            line=dict(color='#ff7f0e', width=3, dash='dash'),
+            marker=dict(size=10, symbol='diamond')
+        ))
+
+    fig.add_hline(
+        y=avg_usage,
+        line_dash="dot",
+        line_color="red",
+        annotation_text=f"Historical Avg: {avg_usage:,.1f} {unit}",
+        annotation_position="top right"
+    )
+
+    if len(history) > 2:
+        x = np.arange(len(history))
+        slope, intercept = np.polyfit(x, history['value'], 1)
+        fig.add_trace(go.Scatter(
+            x=history['period'],
+            y=slope * x + intercept,
+            mode='lines',
+            name='Trend',
+            line=dict(color='green', width=2, dash='dash')
+        ))
+
+    fig.update_layout(LAYOUTS['forecast'], yaxis_title=f"Usage ({unit})")
+    return fig
+
+
+def usage_heatmap(pivot_data, flags):
+    """Ingredient x month usage grid with flagged anomalies marked"""
+    fig = px.imshow(
+        pivot_data,
+        x=[d.strftime('%b %Y') for d in pivot_data.columns],
+        y=pivot_data.index,
+        color_continuous_scale='YlOrRd',
+        aspect='auto',
+        labels=dict(x="Month", y="Ingredient", color="Usage")
+    )
+
+    flag_rows, flag_cols = np.nonzero(
+        flags.reindex(index=pivot_data.index, columns=pivot_data.columns, fill_value=False).to_numpy()
+    )
+    if len(flag_rows) > 0:
+        fig.add_trace(go.Scatter(
+            x=[pivot_data.columns[c].strftime('%b %Y') for c in flag_cols],
+            y=pivot_data.index[flag_rows],
+            mode='markers',
+            name='Anomaly',
+            marker=dict(size=14, color='black', symbol='x-thin', line=dict(width=2, color='black')),
+            showlegend=False
+        ))
+    fig.update_layout(LAYOUTS['usage_heatmap'])
+    return fig
@@ -0,0 +1,99 @@
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+# ============================================================================
+# STARTUP IMPORT BUDGET CHECK
+# ============================================================================
+# Replays the module-level imports of dashboard.py in fresh interpreters under
+# `python -X importtime` and fails when:
+#   - a module that should load lazily (plotly.express, requests, the export
+#     libraries) is imported at startup, or
+#   - the self time of every module the app loads beyond the unavoidable
+#     streamlit + pandas baseline exceeds its budget.
+# Run it before merging changes that touch imports:
+#
+#   python check_startup.py
+#   python check_startup.py --runs 9 --budget-ms 200 --top 15
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.py')
+BASELINE_IMPORTS = "import streamlit\nimport pandas"
+DEFERRED_MODULES = ['plotly.express', 'requests', 'openpyxl', 'fpdf', 'llm_client', 'charts']
+# Self time of modules loaded beyond the baseline (median ms)
+IMPORT_BUDGET_MS = 60
+DEFAULT_RUNS = 5
+
+
+def startup_imports(path=APP):
+    """Source of the import statements at the top level of a script"""
+    tree = ast.parse(open(path, encoding='utf-8').read())
+    nodes = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in nodes)
+
+
+def measure(source, cwd):
+    """importtime rows (name, self us, cumulative us) for source in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', source],
+        capture_output=True, text=True, cwd=cwd
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if self_us.strip().isdigit():
+            # Nested imports are indented below their parent
+            rows.append((name.rstrip()[1:], int(self_us), int(cumulative_us)))
+    return rows
+
+
+def check(runs=DEFAULT_RUNS, budget_ms=IMPORT_BUDGET_MS, top=10):
+    """Print the startup import report; returns True when within budget"""
+    cwd = os.path.dirname(APP)
+    source = startup_imports()
+    baseline = {name.strip() for name, _, _ in measure(BASELINE_IMPORTS, cwd)}
+
+    # Self time of every module the baseline does not load. Summing self
+    # times is far steadier than differencing two wall-clock totals.
+    overheads = []
+    for _ in range(runs):
+        rows = measure(source, cwd)
+        extra = [(name.strip(), self_us) for name, self_us, _ in rows if name.strip() not in baseline]
+        overheads.append(sum(us for _, us in extra) / 1000)
+    overhead = statistics.median(overheads)
+
+    print(f"App import overhead: {overhead:,.1f} ms over streamlit + pandas "
+          f"(median of {runs}, budget {budget_ms:,.0f} ms)")
+
+    print("\nSlowest modules beyond the baseline (self time, last run):")
+    for name, self_us in sorted(extra, key=lambda r: -r[1])[:top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    loaded = {name.strip() for name, _, _ in rows}
+    eager = [m for m in DEFERRED_MODULES if m in loaded]
+    ok = True
+    if eager:
+        print(f"\nFAIL: imported at startup but should load lazily: {', '.join(eager)}")
+        ok = False
+    if overhead > budget_ms:
+        print(f"\nFAIL: app import overhead {overhead:,.0f} ms is over the {budget_ms:,.0f} ms budget")
+        ok = False
+    if ok:
+        print("\nOK: startup imports within budget")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check dashboard startup import time')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    sys.exit(0 if check(args.runs, args.budget_ms, args.top) else 1)
@@ -1,11 +1,22 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
 import numpy as np
-import os
-import requests
+from inventory_ledger import InventoryLedger, EVENT_KINDS, RECEIPT, live_reorder_alerts
+from sales_index import RankIndex, ALL_PERIODS, item_sales_table, category_sales_table
+from kpi_index import KpiIndex, COMPARISONS, PREVIOUS_PERIOD, PREVIOUS_YEAR
+from anomaly_detection import series_matrix, detect_anomalies, clean_series, anomaly_table
+from forecasting import linear_forecast, interval_frame, REORDER_LEVEL
+from delivery_scheduler import build_delivery_schedule, delivery_calendar, DEFAULT_SAFETY_DAYS
+from export_service import (
+    ExportService, FORMATS, READY, RUNNING, FAILED, available_formats, data_version, frame_chunks,
+    inventory_status_table, reorder_recommendations_table, forecast_table_chunks
+)
+from prompt_context import ingredient_facts, build_context, estimate_tokens, TOKEN_BUDGETS, DEFAULT_TOKEN_BUDGET
+from units import (
+    UNIT_NAMES, UNIT_UNITS, normalize_units, canonical_units_by_ingredient,
+    shipment_quantity_canonical, sum_by_unit, mean_by_unit, format_unit_totals
+)
 
 # Page configuration
 st.set_page_config(
@@ -53,6 +64,12 @@ st.markdown("""
         color: #666;
         margin-bottom: 0.5rem;
     }
+    .metric-value-multi {
+        font-size: 1.5rem;
+        font-weight: normal;
+        color: #000;
+        line-height: 2.5rem;
+    }
     .metric-unit {
         font-size: 1rem;
         color: #666;
@@ -70,20 +87,8 @@ st.markdown("""
 
 # Helper function to get unit for ingredient
 def get_unit_for_ingredient(ingredient, data):
-    """Get the unit of measurement for an ingredient"""
-    if 'historical_demand' in data:
-        matching = data['historical_demand'][data['historical_demand']['ingredient'] == ingredient]
-        if not matching.empty:
-            unit = matching.iloc[0]['unit']
-            return unit if pd.notna(unit) else 'units'
-    
-    if 'demand_forecast' in data:
-        matching = data['demand_forecast'][data['demand_forecast']['ingredient'] == ingredient]
-        if not matching.empty:
-            unit = matching.iloc[0]['unit']
-            return unit if pd.notna(unit) else 'units'
-    
-    return 'units'
+    """Get the canonical unit of measurement for an ingredient"""
+    return data.get('ingredient_units', {}).get(ingredient, 'units')
 
 # Load data with caching
 @st.cache_data
@@ -98,6 +103,7 @@ def load_data():
         reorder_alerts = pd.read_csv('reorder_alerts.csv')
         ingredient_bom = pd.read_csv('ingredient_bom_long.csv')
         sales_category = pd.read_csv('sales_category_monthly.csv')
+        sales_item = pd.read_csv('sales_item_monthly.csv')
         shipments_clean = pd.read_csv('shipments_clean.csv')
         demand_forecast = pd.read_csv('demand_forecast_3months.csv')
         forecast_summary = pd.read_csv('forecast_summary.csv')
@@ -112,6 +118,45 @@ def load_data():
         sales_category['period'] = pd.to_datetime(sales_category['period'])
         demand_forecast['period'] = pd.to_datetime(demand_forecast['period'])
         
+        # Normalize units once so every total below is summed per canonical unit
+        historical_demand = normalize_units(historical_demand, ['value'])
+        demand_forecast = normalize_units(demand_forecast, ['forecasted_usage'])
+        ingredient_bom = normalize_units(ingredient_bom, ['quantity_per_item'])
+        unit_codes = canonical_units_by_ingredient(
+            pd.concat([historical_demand[['ingredient', 'unit']], demand_forecast[['ingredient', 'unit']]])
+        )
+        
+        ship_qty, ship_codes = shipment_quantity_canonical(shipments_clean, unit_codes)
+        ship_canonical = shipments_clean[['ingredient', 'ingredient_norm']].assign(
+            avg_quantity_per_shipment=ship_qty,
+            shipment_unit_code=ship_codes
+        )
+        shipment_summary = shipment_summary.merge(ship_canonical, on=['ingredient', 'ingredient_norm'], how='left')
+        
+        # Prediction intervals for every ingredient in one batch (older CSVs lack them)
+        upper_col = f'upper_{REORDER_LEVEL}'
+        if upper_col not in demand_forecast.columns:
+            usage_matrix = series_matrix(
+                historical_demand[historical_demand['data_type'] == 'historical'], 'ingredient', 'value'
+            )
+            bounds = interval_frame(usage_matrix, sorted(demand_forecast['period'].unique()))
+            demand_forecast = demand_forecast.merge(bounds, on=['ingredient', 'period'], how='left')
+        
+        # Days until depletion are based on the upper bound of next month's forecast
+        if 'forecasted_weekly_usage_upper' not in reorder_alerts.columns:
+            next_month = demand_forecast[demand_forecast['period'] == demand_forecast['period'].min()]
+            next_upper = next_month.set_index('ingredient')[upper_col]
+            reorder_alerts['forecasted_usage_upper'] = reorder_alerts['ingredient'].map(next_upper)
+            reorder_alerts['forecasted_weekly_usage_upper'] = reorder_alerts['forecasted_usage_upper'] / 4.33
+        
+        reorder_alerts['unit_code'] = reorder_alerts['ingredient'].map(unit_codes).fillna(UNIT_UNITS).astype(int)
+        reorder_alerts = reorder_alerts.merge(
+            ship_canonical[['ingredient_norm', 'avg_quantity_per_shipment', 'shipment_unit_code']]
+            .drop_duplicates('ingredient_norm'),
+            on='ingredient_norm',
+            how='left'
+        )
+        
         return {
             'kpi_summary': kpi_summary,
             'top5_categories': top5_categories,
@@ -121,11 +166,15 @@ def load_data():
             'reorder_alerts': reorder_alerts,
             'ingredient_bom': ingredient_bom,
             'sales_category': sales_category,
+            'sales_item': sales_item,
             'shipments_clean': shipments_clean,
             'demand_forecast': demand_forecast,
             'forecast_summary': forecast_summary,
             'seasonal_trends': seasonal_trends,
-            'cost_drivers': cost_drivers
+            'cost_drivers': cost_drivers,
+            'ingredient_units': {ing: str(UNIT_NAMES[code]) for ing, code in unit_codes.items()},
+            # Hashed once per load; exports are keyed on it instead of rehashing per rerun
+            'data_version': data_version(reorder_alerts, demand_forecast, historical_demand)
         }
     except FileNotFoundError as e:
         st.error(f"❌ Missing file: {e.filename}")
@@ -135,16 +184,168 @@ def load_data():
         st.error(f"Error loading data: {str(e)}")
         return None
 
+# Live inventory ledger shared across sessions
+@st.cache_resource
+def get_inventory_ledger(reorder_df):
+    """Open the inventory event log and seed it from the reorder table"""
+    return InventoryLedger(reorder_df)
+
+# Sales rank indexes, built once per data version
+@st.cache_resource
+def get_sales_indexes(sales_item_df, sales_category_df):
+    """Build item-level and category-level rank indexes"""
+    item_df = item_sales_table(sales_item_df)
+    category_df = category_sales_table(sales_item_df, sales_category_df)
+    return RankIndex(item_df, 'item', group_col='category'), RankIndex(category_df, 'group')
+
+# Prefix-sum KPI index, built once per data version
+@st.cache_resource
+def get_kpi_index(kpi_df):
+    """Index orders and revenue for range totals and growth"""
+    return KpiIndex(kpi_df)
+
+# Anomaly pass over every ingredient and category series in one batch
+@st.cache_data
+def get_anomalies(historical_df, category_df):
+    """Flag outliers in ingredient usage and category sales"""
+    usage = series_matrix(historical_df[historical_df['data_type'] == 'historical'], 'ingredient', 'value')
+    usage_flags, usage_z, usage_baseline = detect_anomalies(usage)
+    sales = series_matrix(category_df, 'group', 'count')
+    sales_flags, sales_z, sales_baseline = detect_anomalies(sales)
+    
+    anomalies = pd.concat([
+        anomaly_table(usage, usage_flags, usage_z, usage_baseline, 'Ingredient Usage'),
+        anomaly_table(sales, sales_flags, sales_z, sales_baseline, 'Category Orders'),
+    ], ignore_index=True)
+    cleaned_usage = clean_series(usage, usage_flags, usage_baseline)
+    return usage_flags, cleaned_usage, anomalies
+
+# Forecast refit on cleaned history, same linear model as the notebook
+@st.cache_data
+def get_cleaned_forecast(cleaned_usage, forecast_df):
+    """Re-forecast every ingredient from its cleaned series"""
+    future_periods = sorted(forecast_df['period'].unique())
+    forecast, summary = linear_forecast(cleaned_usage, periods_ahead=len(future_periods))
+    units = forecast_df.drop_duplicates('ingredient').set_index('ingredient')['unit']
+    
+    cleaned_forecast = pd.DataFrame({
+        'ingredient': np.repeat(cleaned_usage.index, len(future_periods)),
+        'period': np.tile(future_periods, len(cleaned_usage)),
+        'forecasted_usage': forecast.ravel(),
+    })
+    cleaned_forecast = cleaned_forecast.merge(summary.reset_index(), on='ingredient')
+    cleaned_forecast['unit'] = cleaned_forecast['ingredient'].map(units)
+    cleaned_forecast['forecast_type'] = 'linear_trend_cleaned'
+    cleaned_forecast = cleaned_forecast.merge(
+        interval_frame(cleaned_usage, future_periods), on=['ingredient', 'period'], how='left'
+    )
+    
+    cleaned_summary = summary.reset_index()
+    cleaned_summary['avg_forecasted_usage'] = forecast.mean(axis=1)
+    cleaned_summary['historical_avg'] = cleaned_usage.mean(axis=1).to_numpy()
+    cleaned_summary['pct_change_from_historical'] = (
+        (cleaned_summary['avg_forecasted_usage'] - cleaned_summary['historical_avg'])
+        / cleaned_summary['historical_avg'] * 100
+    )
+    return cleaned_forecast, cleaned_summary
+
+# Charts, built once per data version and reused across reruns and sessions
+@st.cache_resource(max_entries=128)
+def get_chart(builder, *args):
+    """Build a figure with a charts.py builder; plotly loads on first use"""
+    import charts
+    return getattr(charts, builder)(*args)
+
+# Delivery schedule, recomputed only when forecasts, stock or safety days change
+@st.cache_data
+def get_delivery_schedule(forecast_df, on_hand, safety_days):
+    """Plan consolidated supplier deliveries over the forecast horizon"""
+    return build_delivery_schedule(forecast_df, on_hand, safety_days=safety_days)
+
+# Export worker pool and artifact cache shared across sessions
+@st.cache_resource
+def get_export_service():
+    """Start the background export service"""
+    return ExportService()
+
+def _export_panel_body(service, report, title, version, chunks, polling):
+    """Format buttons and download links for one report"""
+    jobs = st.session_state.setdefault('export_jobs', {})
+    formats = available_formats()
+    
+    cols = st.columns(len(formats))
+    for col, fmt in zip(cols, formats):
+        with col:
+            if st.button(f"Build {FORMATS[fmt]['label']}", key=f"export_{report}_{fmt}", use_container_width=True):
+                key = service.request(report, fmt, version, chunks, title)
+                jobs[key] = {'report': report, 'fmt': fmt, 'title': title, 'notified': False}
+                st.rerun()
+    
+    running = False
+    for fmt in formats:
+        key = service.path_for(report, fmt, version)
+        if key not in jobs:
+            continue
+        state, error = service.status(key)
+        label = FORMATS[fmt]['label']
+        if state == READY:
+            st.download_button(
+                label=f"📥 Download {title} ({label})",
+                data=service.read(key),
+                file_name=f"{report}_{datetime.now().strftime('%Y%m%d')}.{fmt}",
+                mime=FORMATS[fmt]['mime'],
+                key=f"download_{report}_{fmt}"
+            )
+        elif state == RUNNING:
+            running = True
+            st.caption(f"⏳ Building {label} file...")
+        elif state == FAILED:
+            st.error(f"❌ {label} export failed: {error}")
+    
+    # Finished while polling: rerun the page to notify and stop polling
+    if polling and not running:
+        st.rerun()
+
+def export_panel(report, title, version, chunks):
+    """Export controls; polls for completion only while a job is running"""
+    service = get_export_service()
+    jobs = st.session_state.setdefault('export_jobs', {})
+    
+    pending = False
+    for key, job in jobs.items():
+        if job['report'] != report:
+            continue
+        state, _ = service.status(key)
+        if state == RUNNING:
+            pending = True
+        elif state == READY and not job['notified']:
+            st.toast(f"✅ {job['title']} ({FORMATS[job['fmt']]['label']}) is ready to download")
+            job['notified'] = True
+    
+    st.fragment(_export_panel_body, run_every=2 if pending else None)(
+        service, report, title, version, chunks, pending
+    )
+
+# Per-ingredient facts for AI prompts, rebuilt only when the source tables change
+@st.cache_data
+def get_context_facts(historical_df, forecast_df, forecast_summary_df, seasonal_df, reorder_df, cost_df):
+    """Join forecast, seasonal, reorder and cost tables per ingredient"""
+    return ingredient_facts(historical_df, forecast_df, forecast_summary_df, seasonal_df, reorder_df, cost_df)
+
+# Shared AI client: one connection pool, rate limiter and breaker for all sessions
+@st.cache_resource
+def get_llm_client():
+    """Create the OpenRouter client shared across sessions"""
+    # requests is only imported once the AI section is used
+    from llm_client import LLMClient
+    return LLMClient()
+
 # Claude AI Agent Function
-def call_claude_agent(prompt, context_data):
+def call_claude_agent(prompt, context_data, tag=None):
     """Call Claude AI via OpenRouter API to generate insights"""
-    api_key = os.getenv('OPENROUTER_API_KEY')
-    
-    if not api_key:
-        return "⚠️ Error: OPENROUTER_API_KEY environment variable not set. Please set it to use the AI agent."
+    from llm_client import LLMError, LLMConfigError, LLMRateLimited, LLMCircuitOpen
     
-    try:
-        full_prompt = f"""You are a restaurant analytics expert helping Mai Shan Yun restaurant understand their ingredient usage and forecasts.
+    full_prompt = f"""You are a restaurant analytics expert helping Mai Shan Yun restaurant understand their ingredient usage and forecasts.
 
 **Context Data:**
 {context_data}
@@ -160,27 +361,16 @@ Please provide clear, actionable insights that anyone can understand, even witho
 
 Keep it concise and practical."""
 
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "anthropic/claude-3.7-sonnet",
-                "messages": [{"role": "user", "content": full_prompt}]
-            },
-            timeout=60
+    try:
+        return get_llm_client().chat(
+            [{"role": "user", "content": full_prompt}], tag=tag, prompt_tokens=estimate_tokens(full_prompt)
         )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result['choices'][0]['message']['content']
-        else:
-            return f"❌ Error calling AI: {response.status_code} - {response.text}"
-            
-    except Exception as e:
-        return f"❌ Error: {str(e)}"
+    except LLMConfigError:
+        return "⚠️ Error: OPENROUTER_API_KEY environment variable not set. Please set it to use the AI agent."
+    except (LLMRateLimited, LLMCircuitOpen) as e:
+        return f"⏳ {e}"
+    except LLMError as e:
+        return f"❌ Error calling AI: {e}"
 
 # Initialize data
 data = load_data()
@@ -188,6 +378,12 @@ data = load_data()
 if data is None:
     st.stop()
 
+ledger = get_inventory_ledger(data['reorder_alerts'])
+ledger.sync()
+# Tables built from live alerts change with the loaded data and the ledger position
+live_version = f"{data['data_version']}e{ledger.last_event_id}"
+live_alerts = live_reorder_alerts(data['reorder_alerts'], ledger)
+
 # Sidebar
 st.sidebar.title("🍜 Mai Shan Yun")
 st.sidebar.markdown("---")
@@ -216,35 +412,73 @@ if page == "📊 Overview":
     
     kpi_df = data['kpi_summary']
     latest_period = kpi_df['period'].max()
-    latest_data = kpi_df[kpi_df['period'] == latest_period].iloc[0]
+    kpi_index = get_kpi_index(kpi_df)
+    
+    # Reporting range and comparison, defaulting to the latest month vs the one before
+    col1, col2, col3 = st.columns([2, 1.5, 2])
+    with col1:
+        picked = st.date_input(
+            "Reporting Range",
+            value=(latest_period.date(), kpi_index.last_date.date()),
+            min_value=kpi_index.first_date.date(),
+            max_value=kpi_index.last_date.date(),
+            key='kpi_range'
+        )
+    with col2:
+        comparison = st.selectbox("Compare With", COMPARISONS, key='kpi_comparison')
+    # The picker returns a single date while the end of a range is being chosen
+    start, end = (picked[0], picked[-1]) if picked else (latest_period, kpi_index.last_date)
+    
+    current = kpi_index.between(start, end)
+    if comparison == PREVIOUS_PERIOD:
+        baseline = kpi_index.previous(start, end)
+    elif comparison == PREVIOUS_YEAR:
+        baseline = kpi_index.year_ago(start, end)
+    else:
+        with col3:
+            custom = st.date_input(
+                "Comparison Range",
+                value=(kpi_index.first_date.date(), kpi_index.first_date.date()),
+                min_value=kpi_index.first_date.date(),
+                max_value=kpi_index.last_date.date(),
+                key='kpi_custom_range'
+            )
+        baseline = kpi_index.between(custom[0], custom[-1]) if custom else kpi_index.totals(0, 0)
+    growth = kpi_index.compare(current, baseline)
+    
+    if baseline['complete']:
+        st.caption(f"{kpi_index.label(current)} compared with {kpi_index.label(baseline)}")
+    else:
+        st.caption(
+            f"{kpi_index.label(current)}. No complete data for the comparison range, so growth is not shown."
+        )
     
     # KPI Cards
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        count_change = latest_data.get('count_mom_growth_%', 0)
+        count_change = growth['count']
         st.metric(
             "Total Orders",
-            f"{int(latest_data['count']):,}",
+            f"{int(current['count']):,}",
             f"{count_change:.1f}%" if pd.notna(count_change) else None
         )
     
     with col2:
-        amount = latest_data.get('amount', 0)
-        amount_change = latest_data.get('amount_mom_growth_%', 0)
+        amount_change = growth['amount']
         st.metric(
             "Revenue",
-            f"${amount:,.0f}",
+            f"${current['amount']:,.0f}",
             f"{amount_change:.1f}%" if pd.notna(amount_change) else None
         )
     
     with col3:
-        total_ingredients = len(data['reorder_alerts'])
+        total_ingredients = len(live_alerts)
         st.metric("Ingredients Tracked", total_ingredients)
     
     with col4:
-        alerts = data['reorder_alerts'][
-            data['reorder_alerts']['forecasted_alert'].str.contains('Critical|Urgent|Soon', na=False)
+        alerts = live_alerts[
+            live_alerts['forecasted_alert'].str.contains('Critical|Urgent|Soon', na=False)
         ].shape[0]
         st.metric("Reorder Alerts", alerts, delta_color="inverse")
     
@@ -255,32 +489,13 @@ if page == "📊 Overview":
     
     with col1:
         st.markdown("### 📈 Monthly Orders Trend")
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=kpi_df['period'],
-            y=kpi_df['count'],
-            mode='lines+markers',
-            line=dict(color='#1f77b4', width=3),
-            marker=dict(size=8),
-            name='Orders'
-        ))
-        fig.update_layout(height=350, showlegend=False, yaxis_title="Number of Orders", xaxis_title="Month")
+        fig = get_chart('trend_line', kpi_df['period'], kpi_df['count'], '#1f77b4', 'orders_trend', 'Orders')
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown("### 💰 Monthly Revenue Trend")
         if 'amount' in kpi_df.columns:
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=kpi_df['period'],
-                y=kpi_df['amount'],
-                mode='lines+markers',
-                line=dict(color='#2ca02c', width=3),
-                marker=dict(size=8),
-                fill='tozeroy',
-                name='Revenue'
-            ))
-            fig.update_layout(height=350, showlegend=False, yaxis_title="Revenue ($)", xaxis_title="Month")
+            fig = get_chart('trend_line', kpi_df['period'], kpi_df['amount'], '#2ca02c', 'revenue_trend', 'Revenue', 'tozeroy')
             st.plotly_chart(fig, use_container_width=True)
     
     # Top categories
@@ -289,20 +504,15 @@ if page == "📊 Overview":
     top5_latest = top5_df[top5_df['period'] == latest_period].sort_values('count', ascending=False)
     
     if not top5_latest.empty:
-        fig = px.bar(
-            top5_latest,
-            x='group',
-            y='count',
-            color='count',
-            color_continuous_scale='Blues',
-            labels={'count': 'Number of Orders', 'group': 'Category'}
+        fig = get_chart(
+            'colored_bar', top5_latest, 'group', 'count', 'Blues',
+            {'count': 'Number of Orders', 'group': 'Category'}, 'top_categories'
         )
-        fig.update_layout(height=400, showlegend=False, xaxis_title="Category", yaxis_title="Number of Orders")
         st.plotly_chart(fig, use_container_width=True)
     
     # Alerts with UNITS
     st.markdown("### ⚠️ Inventory Reorder Alerts")
-    reorder_df = data['reorder_alerts']
+    reorder_df = live_alerts
     alert_df = reorder_df[reorder_df['forecasted_alert'].str.contains('Critical|Urgent|Soon', na=False)].copy()
     
     if not alert_df.empty:
@@ -330,6 +540,7 @@ elif page == "📈 Sales Analysis":
     st.title("📈 Sales Performance Analysis")
     
     sales_df = data['sales_category']
+    item_index, category_index = get_sales_indexes(data['sales_item'], sales_df)
     
     # Sales trend
     st.markdown("### 📊 Sales Trend by Category (Top 10)")
@@ -337,14 +548,7 @@ elif page == "📈 Sales Analysis":
     top_categories = category_sales.groupby('group')['count'].sum().nlargest(10).index
     category_sales_filtered = category_sales[category_sales['group'].isin(top_categories)]
     
-    fig = px.line(
-        category_sales_filtered,
-        x='period',
-        y='count',
-        color='group',
-        labels={'count': 'Number of Orders', 'period': 'Month', 'group': 'Category'}
-    )
-    fig.update_layout(height=450, legend_title_text='Category')
+    fig = get_chart('category_lines', category_sales_filtered)
     st.plotly_chart(fig, use_container_width=True)
     
     # Category comparison
@@ -352,53 +556,77 @@ elif page == "📈 Sales Analysis":
     
     with col1:
         st.markdown("### 🏆 Top Performing Categories")
-        top5_df = data['top5_categories']
-        top5_agg = top5_df.groupby('group')['count'].sum().sort_values(ascending=False).head(5)
-        
-        # Filter out zero values
-        top5_agg_nonzero = top5_agg[top5_agg > 0]
-        
-        if len(top5_agg_nonzero) > 0:
-            fig = go.Figure(data=[go.Pie(
-                labels=top5_agg_nonzero.index,
-                values=top5_agg_nonzero.values,
-                hole=0.3,
-                textinfo='label+percent',
-                textposition='auto',
-                textfont=dict(size=12),
-                marker=dict(line=dict(color='#000000', width=1))
-            )])
-            fig.update_layout(
-                height=400,
-                showlegend=True,
-                legend=dict(orientation="v", yanchor="middle", y=0.5, xanchor="left", x=1.05)
-            )
+        # Index lookup; zero-volume categories are never ranked
+        top5_agg = category_index.top(ALL_PERIODS, 5, 'count')
+        
+        if len(top5_agg) > 0:
+            fig = get_chart('share_pie', top5_agg['group'], top5_agg['count'], 'category_pie')
             st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown("### 📉 Lower Volume Categories")
-        bottom5_df = data['bottom5_categories']
-        bottom5_agg = bottom5_df.groupby('group')['count'].sum().sort_values(ascending=True).head(5)
-        
-        # Filter out zero values
-        bottom5_agg_nonzero = bottom5_agg[bottom5_agg > 0]
-        
-        if len(bottom5_agg_nonzero) > 0:
-            fig = go.Figure(data=[go.Pie(
-                labels=bottom5_agg_nonzero.index,
-                values=bottom5_agg_nonzero.values,
-                hole=0.3,
-                textinfo='label+percent',
-                textposition='auto',
-                textfont=dict(size=12),
-                marker=dict(line=dict(color='#000000', width=1))
-            )])
-            fig.update_layout(
-                height=400,
-                showlegend=True,
-                legend=dict(orientation="v", yanchor="middle", y=0.5, xanchor="left", x=1.05)
-            )
+        bottom5_agg = category_index.bottom(ALL_PERIODS, 5, 'count')
+        
+        if len(bottom5_agg) > 0:
+            fig = get_chart('share_pie', bottom5_agg['group'], bottom5_agg['count'], 'category_pie')
             st.plotly_chart(fig, use_container_width=True)
+    
+    # Item-level drill-down
+    st.markdown("---")
+    st.markdown("### 🔎 Item-Level Drill-Down")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        period_labels = {p: 'All Months' if p == ALL_PERIODS else pd.to_datetime(p).strftime('%B %Y') for p in item_index.periods}
+        drill_period = st.selectbox("Period", item_index.periods, index=len(item_index.periods) - 1, format_func=period_labels.get)
+    
+    with col2:
+        drill_category = st.selectbox("Category", ['All Categories'] + item_index.groups_for(drill_period))
+        drill_group = None if drill_category == 'All Categories' else drill_category
+    
+    with col3:
+        metric_options = {
+            'count': 'Orders',
+            'amount': 'Revenue',
+            'count_growth_%': 'Order Growth (MoM)',
+            'amount_growth_%': 'Revenue Growth (MoM)',
+            'count_rolling_3': 'Orders (3-Month Rolling)',
+            'amount_rolling_3': 'Revenue (3-Month Rolling)',
+        }
+        drill_metric = st.selectbox("Metric", list(metric_options), format_func=metric_options.get)
+    
+    with col4:
+        drill_n = st.slider("Items to show", 3, 20, 10)
+    
+    if drill_metric.endswith('_growth_%') and drill_period == ALL_PERIODS:
+        st.info("Growth is month over month - pick a single month to rank items by growth.")
+    else:
+        top_items = item_index.top(drill_period, drill_n, drill_metric, group=drill_group)
+        bottom_items = item_index.bottom(drill_period, drill_n, drill_metric, group=drill_group)
+        metric_label = metric_options[drill_metric]
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown(f"#### 🏆 Top {drill_n} Items")
+            if not top_items.empty:
+                fig = get_chart('ranked_bar', top_items, drill_metric, metric_label)
+                st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            st.markdown(f"#### 📉 Bottom {drill_n} Items")
+            if not bottom_items.empty:
+                fig = get_chart('ranked_bar', bottom_items, drill_metric, metric_label)
+                st.plotly_chart(fig, use_container_width=True)
+        
+        display_df = top_items.copy()
+        display_df[metric_label] = display_df[drill_metric].round(2)
+        display_df['Share (%)'] = display_df['share_%'].round(2)
+        display_df['MoM Growth (%)'] = display_df['growth_%'].round(1)
+        display_df = display_df[['item', 'category', metric_label, 'Share (%)', 'MoM Growth (%)']]
+        display_df.columns = ['Item', 'Category', metric_label, 'Share (%)', 'MoM Growth (%)']
+        st.dataframe(display_df, use_container_width=True, hide_index=True)
 
 # ============================================================================
 # PAGE 3: INVENTORY
@@ -406,7 +634,7 @@ elif page == "📈 Sales Analysis":
 elif page == "🥗 Inventory":
     st.title("🥗 Inventory Management")
     
-    reorder_df = data['reorder_alerts']
+    reorder_df = live_alerts
     
     # Summary metrics - WITH UNITS INLINE - CORRECTED
     col1, col2, col3, col4 = st.columns(4)
@@ -415,12 +643,12 @@ elif page == "🥗 Inventory":
         st.markdown(f'<div style="text-align:center;"><div class="metric-label">Total Ingredients</div><div class="metric-value">{len(reorder_df)}</div></div>', unsafe_allow_html=True)
     
     with col2:
-        total_usage_g = reorder_df['total_usage'].sum()
-        st.markdown(f'<div style="text-align:center;"><div class="metric-label">Total Usage (Historical)</div><div class="metric-value">{total_usage_g:,.0f} g</div></div>', unsafe_allow_html=True)
+        total_usage = format_unit_totals(sum_by_unit(reorder_df['total_usage'], reorder_df['unit_code']))
+        st.markdown(f'<div style="text-align:center;"><div class="metric-label">Total Usage (Historical)</div><div class="metric-value-multi">{total_usage}</div></div>', unsafe_allow_html=True)
     
     with col3:
-        avg_weekly_g = reorder_df['forecasted_weekly_usage'].mean()
-        st.markdown(f'<div style="text-align:center;"><div class="metric-label">Avg Weekly Usage (Forecast)</div><div class="metric-value">{avg_weekly_g:,.0f} g</div></div>', unsafe_allow_html=True)
+        avg_weekly = format_unit_totals(mean_by_unit(reorder_df['forecasted_weekly_usage'], reorder_df['unit_code']))
+        st.markdown(f'<div style="text-align:center;"><div class="metric-label">Avg Weekly Usage (Forecast)</div><div class="metric-value-multi">{avg_weekly}</div></div>', unsafe_allow_html=True)
     
     with col4:
         alerts = reorder_df[reorder_df['forecasted_alert'].str.contains('Critical|Urgent|Soon', na=False)].shape[0]
@@ -435,46 +663,30 @@ elif page == "🥗 Inventory":
         st.markdown("### Alert Status Distribution (Forecasted)")
         alert_counts = reorder_df['forecasted_alert'].value_counts()
         
-        fig = go.Figure(data=[go.Pie(
-            labels=alert_counts.index,
-            values=alert_counts.values,
-            hole=0.3,
-            textinfo='label+percent',
-            textposition='auto',
-            textfont=dict(size=11),
-            marker=dict(line=dict(color='#000000', width=1))
-        )])
-        fig.update_layout(
-            height=350,
-            showlegend=True,
-            legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5)
-        )
+        fig = get_chart('share_pie', alert_counts.index.tolist(), alert_counts.tolist(), 'alert_pie', 11)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown("### Days Until Depletion Distribution")
         valid_days = reorder_df[reorder_df['forecasted_days_until_depletion'].notna()]['forecasted_days_until_depletion']
         if len(valid_days) > 0:
-            fig = go.Figure(data=[go.Histogram(
-                x=valid_days,
-                nbinsx=20,
-                marker=dict(color='#1f77b4', line=dict(color='#000000', width=1))
-            )])
-            fig.update_layout(
-                height=350,
-                xaxis_title="Days Until Empty",
-                yaxis_title="Number of Ingredients",
-                showlegend=False
-            )
+            fig = get_chart('depletion_histogram', valid_days)
             st.plotly_chart(fig, use_container_width=True)
     
     # Inventory table - WITH UNITS INLINE
     st.markdown("### 📋 Complete Ingredient Status Report")
-    display_df = reorder_df[['ingredient', 'total_usage', 'forecasted_weekly_usage', 'forecasted_days_until_depletion', 'forecasted_alert']].copy()
+    st.caption(f"Days until empty use the upper {REORDER_LEVEL}% bound of next month's forecast, so low-confidence forecasts reorder earlier.")
+    display_df = reorder_df[['ingredient', 'on_hand', 'total_usage', 'forecasted_weekly_usage', 'forecasted_days_until_depletion', 'forecasted_alert']].copy()
     display_df = display_df.sort_values('forecasted_days_until_depletion')
     
     # Add units inline
     display_df['unit'] = display_df['ingredient'].apply(lambda x: get_unit_for_ingredient(x, data))
+    display_df['On Hand'] = display_df.apply(
+        lambda row: "N/A" if pd.isna(row['on_hand'])
+        else "Out of stock" if row['on_hand'] <= 0
+        else f"{row['on_hand']:,.1f} {row['unit']}",
+        axis=1
+    )
     display_df['Total Usage (Historical)'] = display_df.apply(
         lambda row: f"{row['total_usage']:,.1f} {row['unit']}", axis=1
     )
@@ -483,27 +695,78 @@ elif page == "🥗 Inventory":
     )
     display_df['Days Until Empty'] = display_df['forecasted_days_until_depletion'].round(1)
     
-    display_df = display_df[['ingredient', 'Total Usage (Historical)', 'Weekly Usage (Forecast)', 'Days Until Empty', 'forecasted_alert']]
-    display_df.columns = ['Ingredient', 'Total Usage (Historical)', 'Weekly Usage (Forecast)', 'Days Until Empty', 'Alert Status']
+    display_df = display_df[['ingredient', 'On Hand', 'Total Usage (Historical)', 'Weekly Usage (Forecast)', 'Days Until Empty', 'forecasted_alert']]
+    display_df.columns = ['Ingredient', 'On Hand', 'Total Usage (Historical)', 'Weekly Usage (Forecast)', 'Days Until Empty', 'Alert Status']
     
     st.dataframe(display_df, use_container_width=True, hide_index=True)
     
+    # Shipments logged in a different unit than the usage forecast cannot seed stock
+    mismatched = reorder_df[
+        reorder_df['shipment_unit_code'].notna() & (reorder_df['shipment_unit_code'] != reorder_df['unit_code'])
+    ]['ingredient']
+    if not mismatched.empty:
+        st.caption(
+            f"On hand is unknown for {', '.join(mismatched)}: shipments are recorded in a different unit "
+            f"than usage. Record a receipt in the usage unit to start tracking stock."
+        )
+    
+    with st.expander("📤 Export Status Report"):
+        export_panel(
+            'inventory_status', 'Inventory Status Report', live_version,
+            lambda df=reorder_df, units=data.get('ingredient_units', {}): frame_chunks(inventory_status_table(df, units))
+        )
+    
+    # Record receipts and usage against the live ledger
+    st.markdown("### 📝 Record Inventory Event")
+    st.caption("Log shipments and usage directly, or record menu sales to deduct their recipe ingredients.")
+    with st.form("inventory_event", clear_on_submit=True):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            event_ingredient = st.selectbox("Ingredient", sorted(ledger.state.keys()))
+        with col2:
+            event_kind = st.selectbox(
+                "Event Type", EVENT_KINDS,
+                format_func=lambda k: "Shipment Received" if k == RECEIPT else "Usage"
+            )
+        with col3:
+            event_qty = st.number_input(
+                f"Quantity ({get_unit_for_ingredient(event_ingredient, data)})",
+                min_value=0.0, step=100.0
+            )
+        if st.form_submit_button("Record Event") and event_qty > 0:
+            ledger.record(event_ingredient, event_kind, event_qty)
+            st.rerun()
+    
+    # Menu sales draw down every ingredient in the item's recipe
+    bom_df = data['ingredient_bom']
+    menu_items = bom_df.drop_duplicates('item_norm').set_index('item_norm')['item_name'].sort_values()
+    with st.form("sale_event", clear_on_submit=True):
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            sale_item = st.selectbox("Menu Item", menu_items.index, format_func=lambda i: menu_items[i])
+        with col2:
+            sale_count = st.number_input("Items Sold", min_value=0, step=1)
+        if st.form_submit_button("Record Sale") and sale_count > 0:
+            ledger.record_sale(sale_item, sale_count, bom_df)
+            st.rerun()
+    
+    with st.expander("📜 Recent Inventory Events"):
+        recent_events = ledger.recent_events()
+        if recent_events.empty:
+            st.caption("No events recorded yet. Stock levels assume one average shipment on hand.")
+        else:
+            st.dataframe(recent_events, use_container_width=True, hide_index=True)
+    
     # Top usage - WITH UNITS
     st.markdown("### 🔝 Top 10 Ingredients by Total Historical Usage")
     top_ingredients = reorder_df.nlargest(10, 'total_usage').copy()
     top_ingredients['unit'] = top_ingredients['ingredient'].apply(lambda x: get_unit_for_ingredient(x, data))
     top_ingredients['label'] = top_ingredients['ingredient'] + ' (' + top_ingredients['unit'] + ')'
     
-    fig = px.bar(
-        top_ingredients,
-        x='total_usage',
-        y='label',
-        orientation='h',
-        color='total_usage',
-        color_continuous_scale='Viridis',
-        labels={'label': 'Ingredient', 'total_usage': 'Total Usage'}
+    fig = get_chart(
+        'colored_bar', top_ingredients, 'total_usage', 'label', 'Viridis',
+        {'label': 'Ingredient', 'total_usage': 'Total Usage'}, 'top_usage', 'h'
     )
-    fig.update_layout(height=500, showlegend=False, yaxis_title="", xaxis_title="Total Historical Usage")
     st.plotly_chart(fig, use_container_width=True)
 
 # ============================================================================
@@ -513,7 +776,7 @@ elif page == "📦 Shipments":
     st.title("📦 Shipment Management")
     
     shipment_df = data['shipment_summary']
-    reorder_df = data['reorder_alerts']
+    reorder_df = live_alerts
     
     # Metrics - WITH UNITS INLINE
     col1, col2, col3 = st.columns(3)
@@ -523,8 +786,10 @@ elif page == "📦 Shipments":
         st.markdown(f'<div style="text-align:center;"><div class="metric-label">Total Monthly Shipments</div><div class="metric-value">{int(total_shipments)}</div></div>', unsafe_allow_html=True)
     
     with col2:
-        avg_qty_g = shipment_df['avg_quantity_per_shipment_grams'].mean()
-        st.markdown(f'<div style="text-align:center;"><div class="metric-label">Avg Quantity per Shipment</div><div class="metric-value">{avg_qty_g:,.1f} g</div></div>', unsafe_allow_html=True)
+        avg_qty = format_unit_totals(
+            mean_by_unit(shipment_df['avg_quantity_per_shipment'], shipment_df['shipment_unit_code']), '{:,.1f}'
+        )
+        st.markdown(f'<div style="text-align:center;"><div class="metric-label">Avg Quantity per Shipment</div><div class="metric-value-multi">{avg_qty}</div></div>', unsafe_allow_html=True)
     
     with col3:
         weekly = (1 / shipment_df['weeks_between_shipments']).sum()
@@ -537,28 +802,20 @@ elif page == "📦 Shipments":
     
     with col1:
         st.markdown("### 📊 Monthly Shipment Frequency by Ingredient")
-        fig = px.bar(
-            shipment_df.sort_values('number_of_shipments', ascending=False),
-            x='ingredient',
-            y='number_of_shipments',
-            color='number_of_shipments',
-            color_continuous_scale='Blues',
-            labels={'number_of_shipments': 'Shipments per Month', 'ingredient': 'Ingredient'}
+        fig = get_chart(
+            'colored_bar', shipment_df.sort_values('number_of_shipments', ascending=False),
+            'ingredient', 'number_of_shipments', 'Blues',
+            {'number_of_shipments': 'Shipments per Month', 'ingredient': 'Ingredient'}, 'shipment_frequency'
         )
-        fig.update_layout(height=400, xaxis_tickangle=-45, showlegend=False, yaxis_title="Shipments per Month")
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown("### 📦 Average Shipment Quantity by Ingredient")
-        fig = px.bar(
-            shipment_df.sort_values('avg_quantity_per_shipment_grams', ascending=False),
-            x='ingredient',
-            y='avg_quantity_per_shipment_grams',
-            color='avg_quantity_per_shipment_grams',
-            color_continuous_scale='Greens',
-            labels={'avg_quantity_per_shipment_grams': 'Quantity (grams)', 'ingredient': 'Ingredient'}
+        fig = get_chart(
+            'colored_bar', shipment_df.sort_values('avg_quantity_per_shipment_grams', ascending=False),
+            'ingredient', 'avg_quantity_per_shipment_grams', 'Greens',
+            {'avg_quantity_per_shipment_grams': 'Quantity (grams)', 'ingredient': 'Ingredient'}, 'shipment_quantity'
         )
-        fig.update_layout(height=400, xaxis_tickangle=-45, showlegend=False, yaxis_title="Average Quantity (g)")
         st.plotly_chart(fig, use_container_width=True)
     
     # Reorder recommendations - WITH UNITS INLINE
@@ -577,8 +834,72 @@ elif page == "📦 Shipments":
         display_df.columns = ['Ingredient', 'Weekly Usage (Forecasted)', 'Days Until Empty', 'Alert Status']
         
         st.dataframe(display_df, use_container_width=True, hide_index=True)
+        
+        with st.expander("📤 Export Reorder Recommendations"):
+            export_panel(
+                'reorder_recommendations', 'Reorder Recommendations', live_version,
+                lambda df=reorder_df, units=data.get('ingredient_units', {}):
+                    frame_chunks(reorder_recommendations_table(df, units))
+            )
     else:
         st.success("✅ All ingredient levels are currently sufficient!")
+    
+    # Consolidated delivery plan
+    st.markdown("### 🗓️ Consolidated Delivery Schedule")
+    st.caption("Ingredients from the same supplier are delivered together. A supplier is scheduled on any day one of its ingredients would drop below the safety stock floor; orders never exceed what is used within the ingredient's shelf life, so short shelf-life items get several drops a week.")
+    
+    safety_days = st.slider("Safety stock (days of usage)", 0, 7, DEFAULT_SAFETY_DAYS)
+    on_hand = {ing: entry['on_hand'] for ing, entry in ledger.state.items()}
+    deliveries, projected_stock, delivery_risks = get_delivery_schedule(data['demand_forecast'], on_hand, safety_days)
+    
+    if deliveries.empty:
+        st.success("✅ Current stock covers the whole forecast horizon")
+    else:
+        calendar = delivery_calendar(deliveries)
+        trucks = deliveries[['supplier', 'date']].drop_duplicates().shape[0]
+        horizon_weeks = projected_stock.shape[0] / 7
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown(f'<div style="text-align:center;"><div class="metric-label">Planned Deliveries</div><div class="metric-value">{trucks}</div></div>', unsafe_allow_html=True)
+        with col2:
+            st.markdown(f'<div style="text-align:center;"><div class="metric-label">Planned Weekly Deliveries</div><div class="metric-value">{trucks / horizon_weeks:.1f}</div></div>', unsafe_allow_html=True)
+        with col3:
+            st.markdown(f'<div style="text-align:center;"><div class="metric-label">Suppliers</div><div class="metric-value">{calendar.shape[0]}</div></div>', unsafe_allow_html=True)
+        
+        fig = get_chart('delivery_calendar_heatmap', calendar)
+        st.plotly_chart(fig, use_container_width=True)
+        
+        schedule_df = deliveries.copy()
+        schedule_df['unit'] = schedule_df['ingredient'].apply(lambda x: get_unit_for_ingredient(x, data))
+        schedule_df['Delivery Date'] = schedule_df['date'].dt.strftime('%a %b %d, %Y')
+        schedule_df['Order Quantity'] = schedule_df.apply(
+            lambda row: f"{row['quantity']:,.1f} {row['unit']}", axis=1
+        )
+        schedule_df['Weekly Usage (Forecasted)'] = schedule_df.apply(
+            lambda row: f"{row['weekly_usage']:,.1f} {row['unit']}", axis=1
+        )
+        schedule_df = schedule_df.sort_values(['date', 'supplier', 'ingredient'])
+        schedule_df = schedule_df[['Delivery Date', 'supplier', 'ingredient', 'Order Quantity', 'Weekly Usage (Forecasted)']]
+        schedule_df.columns = ['Delivery Date', 'Supplier', 'Ingredient', 'Order Quantity', 'Weekly Usage (Forecasted)']
+        
+        with st.expander("📋 Delivery Details"):
+            st.dataframe(schedule_df, use_container_width=True, hide_index=True)
+    
+    # Anything the plan cannot keep above the floor is reported, not dropped
+    at_risk = delivery_risks[(delivery_risks['days_below_floor'] > 0) | (delivery_risks['unmet_demand'] > 0)].copy()
+    if at_risk.empty:
+        st.caption(f"Every ingredient stays above {safety_days} days of safety stock for the whole horizon.")
+    else:
+        st.warning(
+            f"⚠️ {len(at_risk)} ingredients drop below {safety_days} days of safety stock, even with daily "
+            f"deliveries. Items that spoil in fewer days than the safety stock plus one cannot be kept above it."
+        )
+        at_risk['unit'] = at_risk['ingredient'].apply(lambda x: get_unit_for_ingredient(x, data))
+        at_risk['Unmet Demand'] = at_risk.apply(lambda row: f"{row['unmet_demand']:,.1f} {row['unit']}", axis=1)
+        at_risk = at_risk[['ingredient', 'supplier', 'shelf_life_days', 'days_below_floor', 'Unmet Demand']]
+        at_risk.columns = ['Ingredient', 'Supplier', 'Shelf Life (days)', 'Days Below Safety Stock', 'Unmet Demand']
+        st.dataframe(at_risk, use_container_width=True, hide_index=True)
 
 # ============================================================================
 # PAGE 5: FORECASTING (ENHANCED)
@@ -591,6 +912,9 @@ elif page == "🔮 Forecasting":
     forecast_summary_df = data['forecast_summary']
     seasonal_df = data['seasonal_trends']
     cost_df = data['cost_drivers']
+    usage_flags, cleaned_usage, anomalies = get_anomalies(
+        historical_df, category_sales_table(data['sales_item'], data['sales_category'])
+    )
     
     # Forecast period
     forecast_period_start = forecast_df['period'].min()
@@ -617,8 +941,8 @@ elif page == "🔮 Forecasting":
         st.markdown(f'<div style="text-align:center;"><div class="metric-label">Strong Trends</div><div class="metric-value">{strong_trends}</div></div>', unsafe_allow_html=True)
     
     with col4:
-        critical_reorders = data['reorder_alerts'][
-            data['reorder_alerts']['forecasted_alert'].str.contains('Critical|Urgent', na=False)
+        critical_reorders = live_alerts[
+            live_alerts['forecasted_alert'].str.contains('Critical|Urgent', na=False)
         ].shape[0]
         st.markdown(f'<div style="text-align:center;"><div class="metric-label">Critical Reorders</div><div class="metric-value">{critical_reorders}</div></div>', unsafe_allow_html=True)
     
@@ -629,6 +953,13 @@ elif page == "🔮 Forecasting":
     ingredients = sorted(historical_df['ingredient'].unique())
     selected = st.selectbox("Choose an ingredient:", ingredients, label_visibility="collapsed")
     
+    use_cleaned = st.checkbox(
+        "Forecast on cleaned series (replace flagged outliers with their robust baseline)",
+        value=False
+    )
+    if use_cleaned:
+        forecast_df, forecast_summary_df = get_cleaned_forecast(cleaned_usage, forecast_df)
+    
     # Get unit for selected ingredient
     selected_unit = get_unit_for_ingredient(selected, data)
     
@@ -665,58 +996,17 @@ elif page == "🔮 Forecasting":
     # Time series with historical + forecast
     st.markdown(f"### 📈 Usage Trend & 3-Month Forecast: {selected.title()}")
     
-    fig = go.Figure()
-    
-    # Historical data
     hist_data = ingredient_historical[ingredient_historical['data_type'] == 'historical']
-    fig.add_trace(go.Scatter(
-        x=hist_data['period'],
-        y=hist_data['value'],
-        mode='lines+markers',
-        name='Historical',
-        line=dict(color='#1f77b4', width=3),
-        marker=dict(size=10)
-    ))
-    
-    # Forecast data
-    if not ingredient_forecast.empty:
-        fig.add_trace(go.Scatter(
-            x=ingredient_forecast['period'],
-            y=ingredient_forecast['forecasted_usage'],
-            mode='lines+markers',
-            name='Forecast',
-            line=dict(color='#ff7f0e', width=3, dash='dash'),
-            marker=dict(size=10, symbol='diamond')
-        ))
-    
-    # Average line
-    fig.add_hline(
-        y=avg_usage,
-        line_dash="dot",
-        line_color="red",
-        annotation_text=f"Historical Avg: {avg_usage:,.1f} {selected_unit}",
-        annotation_position="top right"
-    )
     
-    # Trend line
-    if len(historical_only) > 2:
-        z = np.polyfit(range(len(historical_only)), historical_only['value'], 1)
-        p = np.poly1d(z)
-        fig.add_trace(go.Scatter(
-            x=historical_only['period'],
-            y=p(range(len(historical_only))),
-            mode='lines',
-            name='Trend',
-            line=dict(color='green', width=2, dash='dash')
-        ))
-    
-    fig.update_layout(
-        height=450,
-        hovermode='x unified',
-        yaxis_title=f"Usage ({selected_unit})",
-        xaxis_title="Period",
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
+    # Flagged outliers, and the cleaned series when forecasting on it
+    flagged = cleaned = None
+    if selected in usage_flags.index:
+        flagged_periods = usage_flags.columns[usage_flags.loc[selected].to_numpy()]
+        flagged = hist_data[hist_data['period'].isin(flagged_periods)]
+        if use_cleaned:
+            cleaned = cleaned_usage.loc[selected]
+    
+    fig = get_chart('forecast_chart', hist_data, flagged, cleaned, ingredient_forecast, avg_usage, selected_unit)
     st.plotly_chart(fig, use_container_width=True)
     
     # Forecast details - WITH UNITS
@@ -726,13 +1016,16 @@ elif page == "🔮 Forecasting":
         col1, col2 = st.columns(2)
         
         with col1:
-            forecast_detail = ingredient_forecast[['period', 'forecasted_usage', 'trend_strength', 'r_squared']].copy()
+            forecast_detail = ingredient_forecast[['period', 'forecasted_usage', 'lower_80', 'upper_80', 'trend_strength', 'r_squared']].copy()
             forecast_detail['Month'] = forecast_detail['period'].dt.strftime('%B %Y')
             forecast_detail[f'Forecasted Usage ({selected_unit})'] = forecast_detail['forecasted_usage'].apply(lambda x: f"{x:,.1f}")
+            forecast_detail['80% Range'] = forecast_detail.apply(
+                lambda row: f"{row['lower_80']:,.0f} - {row['upper_80']:,.0f}", axis=1
+            )
             forecast_detail['Trend Strength'] = forecast_detail['trend_strength'].str.capitalize()
             forecast_detail['R-Squared'] = forecast_detail['r_squared'].round(4)
             
-            forecast_detail = forecast_detail[['Month', f'Forecasted Usage ({selected_unit})', 'Trend Strength', 'R-Squared']]
+            forecast_detail = forecast_detail[['Month', f'Forecasted Usage ({selected_unit})', '80% Range', 'Trend Strength', 'R-Squared']]
             
             st.dataframe(forecast_detail, use_container_width=True, hide_index=True)
         
@@ -751,6 +1044,13 @@ elif page == "🔮 Forecasting":
                 else:
                     st.warning(f"📉 Expected to decrease by {abs(summary['pct_change_from_historical']):.1f}%")
     
+    with st.expander("📤 Export Forecasts for All Ingredients"):
+        export_report = 'forecast_cleaned' if use_cleaned else 'forecast'
+        export_panel(
+            export_report, 'Demand Forecast', data['data_version'],
+            lambda df=forecast_df, units=data.get('ingredient_units', {}): forecast_table_chunks(df, units)
+        )
+    
     st.markdown("---")
     
     # Seasonal Insights - WITH UNITS INLINE
@@ -783,16 +1083,23 @@ elif page == "🔮 Forecasting":
         values='value'
     )
     
-    fig = px.imshow(
-        pivot_data,
-        x=[d.strftime('%b %Y') for d in pivot_data.columns],
-        y=pivot_data.index,
-        color_continuous_scale='YlOrRd',
-        aspect='auto',
-        labels=dict(x="Month", y="Ingredient", color="Usage")
-    )
-    fig.update_layout(height=600)
+    fig = get_chart('usage_heatmap', pivot_data, usage_flags)
     st.plotly_chart(fig, use_container_width=True)
+    st.caption("✖ marks usage points flagged as anomalies (robust z-score against each ingredient's median)")
+    
+    with st.expander(f"🚨 Flagged Anomalies ({len(anomalies)})"):
+        if anomalies.empty:
+            st.caption("No anomalies detected")
+        else:
+            anomaly_df = anomalies.copy()
+            anomaly_df['Month'] = pd.to_datetime(anomaly_df['period']).dt.strftime('%b %Y')
+            anomaly_df['Value'] = anomaly_df['value'].round(1)
+            anomaly_df['Expected'] = anomaly_df['baseline'].round(1)
+            anomaly_df['Z-Score'] = anomaly_df['z_score'].round(2)
+            anomaly_df = anomaly_df.sort_values('z_score', key=abs, ascending=False)
+            anomaly_df = anomaly_df[['series_type', 'series', 'Month', 'Value', 'Expected', 'Z-Score']]
+            anomaly_df.columns = ['Series Type', 'Series', 'Month', 'Value', 'Expected', 'Z-Score']
+            st.dataframe(anomaly_df, use_container_width=True, hide_index=True)
     
     st.markdown("---")
     
@@ -801,65 +1108,38 @@ elif page == "🔮 Forecasting":
     # ========================================================================
     st.markdown("### 🤖 AI-Powered Insights")
     
-    st.info("💡 Generate personalized, actionable insights using Claude AI based on the forecasting data and trends for this ingredient.")
+    st.info("💡 Generate personalized, actionable insights using Claude AI based on the forecasting data and trends for one or more ingredients.")
     
-    # Prepare context data for AI - WITH UNITS
-    context_summary = f"""
-**Restaurant:** Mai Shan Yun
-
-**Current Ingredient Being Analyzed:** {selected}
-**Unit of Measurement:** {selected_unit}
-
-**Historical Data Summary:**
-- Average Monthly Usage: {avg_usage:,.1f} {selected_unit}
-- Peak Usage: {max_usage:,.1f} {selected_unit}
-- Volatility (Standard Deviation): {std_usage:,.1f} {selected_unit}
-
-**Forecast Summary:**
-"""
-    
-    if not ingredient_forecast.empty and selected in forecast_summary_df['ingredient'].values:
-        summary = forecast_summary_df[forecast_summary_df['ingredient'] == selected].iloc[0]
-        context_summary += f"""
-- Forecasted Average Usage (Next 3 Months): {summary['avg_forecasted_usage']:,.1f} {selected_unit}
-- Trend Strength: {summary['trend_strength'].capitalize()}
-- Expected Change from Historical: {summary['pct_change_from_historical']:.1f}%
-"""
-    
-    if selected in seasonal_df['ingredient'].values:
-        seasonal_info = seasonal_df[seasonal_df['ingredient'] == selected].iloc[0]
-        context_summary += f"""
-**Seasonal Patterns:**
-- Peak Month: {seasonal_info['peak_month']} ({seasonal_info['peak_usage']:,.0f} {selected_unit})
-- Low Month: {seasonal_info['low_month']} ({seasonal_info['low_usage']:,.0f} {selected_unit})
-- Seasonal Variation: {seasonal_info['seasonal_variation_%']:.1f}%
-"""
-    
-    # Reorder alert info
-    if selected in data['reorder_alerts']['ingredient'].values:
-        reorder_info = data['reorder_alerts'][data['reorder_alerts']['ingredient'] == selected].iloc[0]
-        context_summary += f"""
-**Inventory Status:**
-- Current Alert: {reorder_info['forecasted_alert']}
-- Days Until Depletion (Forecasted): {reorder_info['forecasted_days_until_depletion']:.1f} days
-- Weekly Usage (Forecasted): {reorder_info['forecasted_weekly_usage']:,.1f} {selected_unit}
-"""
-    
-    # Cost impact
-    if selected in cost_df['ingredient'].values:
-        cost_info = cost_df[cost_df['ingredient'] == selected].iloc[0]
-        context_summary += f"""
-**Shipment Requirements (Based on Forecast):**
-- Average Monthly Forecast: {cost_info['avg_monthly_forecast']:,.1f} {selected_unit}
-- Shipments Needed Per Month: {cost_info['shipments_needed_per_month']:.0f}
-- Delivery Frequency: {cost_info['frequency']}
-"""
+    # AI context: one or more ingredients, compacted to a token budget
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        ai_ingredients = st.multiselect(
+            "Ingredients to include:", ingredients, default=[selected],
+            help="Leave empty to ask about every ingredient"
+        )
+    with col2:
+        token_budget = st.select_slider("Context budget (tokens)", TOKEN_BUDGETS, value=DEFAULT_TOKEN_BUDGET)
+    ai_ingredients = ai_ingredients or ingredients
+    
+    facts = get_context_facts(historical_df, forecast_df, forecast_summary_df, seasonal_df, live_alerts, cost_df)
+    context = build_context(facts, ai_ingredients, data.get('ingredient_units', {}), budget=token_budget)
+    context_summary = context['text']
+    
+    if len(ai_ingredients) == 1:
+        subject = f"{ai_ingredients[0]} ingredient (measured in {get_unit_for_ingredient(ai_ingredients[0], data)})"
+        report_name = ai_ingredients[0]
+    elif len(ai_ingredients) == len(ingredients):
+        subject = "all tracked ingredients"
+        report_name = "all ingredients"
+    else:
+        subject = f"these {len(ai_ingredients)} ingredients: {', '.join(ai_ingredients)}"
+        report_name = f"{len(ai_ingredients)} ingredients"
     
     # Generate insights button
     if st.button("🚀 Generate AI Insights", type="primary"):
         with st.spinner("🤖 Claude AI is analyzing your data..."):
             
-            user_prompt = f"""Generate comprehensive, business-focused insights for {selected} ingredient (measured in {selected_unit}) at Mai Shan Yun restaurant. 
+            user_prompt = f"""Generate comprehensive, business-focused insights for {subject} at Mai Shan Yun restaurant. 
             
 The restaurant manager needs to understand:
 1. What the forecast data indicates about future demand
@@ -869,7 +1149,7 @@ The restaurant manager needs to understand:
 
 Please use clear, professional language that is accessible to non-technical stakeholders."""
             
-            ai_response = call_claude_agent(user_prompt, context_summary)
+            ai_response = call_claude_agent(user_prompt, context_summary, tag=report_name)
             
             # Display AI response
             st.markdown("#### 💡 AI-Generated Insights")
@@ -883,14 +1163,48 @@ Please use clear, professional language that is accessible to non-technical stak
             # Download option
             st.download_button(
                 label="📥 Download Complete Insights Report",
-                data=f"AI Insights Report for {selected}\nGenerated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}\n\n{'='*70}\n\n{context_summary}\n\n{'='*70}\n\nAI INSIGHTS:\n\n{ai_response}",
-                file_name=f"insights_{selected.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.txt",
+                data=f"AI Insights Report for {report_name}\nGenerated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}\n\n{'='*70}\n\n{context_summary}\n\n{'='*70}\n\nAI INSIGHTS:\n\n{ai_response}",
+                file_name=f"insights_{report_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.txt",
                 mime="text/plain"
             )
     
     # Show context data used
     with st.expander("📋 View Data Context Provided to AI"):
+        caption = f"~{context['tokens']:,} of {context['budget']:,} tokens · detail: {context['detail_level']}"
+        if context['summarized']:
+            caption += f" · {len(context['summarized'])} least urgent ingredients summarized"
+        st.caption(caption)
         st.text(context_summary)
+    
+    # AI service health across all sessions
+    with st.expander("🩺 AI Service Health"):
+        llm_client = get_llm_client()
+        health = llm_client.metrics.snapshot()
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Circuit", llm_client.breaker.state.title())
+        with col2:
+            st.metric("Requests", health['requests'])
+        with col3:
+            st.metric("Error Rate", f"{health['error_rate']:.0%}")
+        with col4:
+            p95 = health['latency_p95']
+            st.metric("Latency p95", f"{p95:.1f}s" if p95 is not None else "—")
+        
+        st.caption(
+            f"Retries: {health['retries']} · Rate limited: {health['rate_limited']} · "
+            f"Rejected while circuit open: {health['circuit_rejected']}"
+        )
+        
+        recent = llm_client.metrics.recent_requests()
+        if recent:
+            recent_df = pd.DataFrame(recent)
+            recent_df['time'] = pd.to_datetime(recent_df['time'], unit='s').dt.strftime('%H:%M:%S')
+            recent_df['latency'] = recent_df['latency'].map(lambda x: f"{x:.2f}s")
+            recent_df = recent_df[['time', 'tag', 'prompt_tokens', 'completion_tokens', 'latency', 'outcome']]
+            recent_df.columns = ['Time', 'Request', 'Prompt Tokens', 'Response Tokens', 'Latency', 'Outcome']
+            st.dataframe(recent_df, use_container_width=True, hide_index=True)
 
 # Footer
 st.markdown("---")
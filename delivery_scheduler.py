@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# DELIVERY CONSOLIDATION SCHEDULER
+# ============================================================================
+# Day-by-day joint replenishment heuristic. Ingredients from the same
+# supplier share a truck: when any one of them would end the day below its
+# safety floor, the whole group is delivered and every member is topped up
+# to an order-up-to level that never exceeds what is used within its shelf
+# life. Planning by day lets short shelf-life items take several drops a
+# week instead of running out. Each day is a handful of array operations
+# over all ingredients at once.
+
+WEEKS_PER_MONTH = 4.33  # same factor the notebook uses for weekly usage
+DEFAULT_SAFETY_DAYS = 2
+MAX_COVER_WEEKS = 4
+
+# Supplier groupings (editable). Anything not listed ships on its own.
+SUPPLIER_GROUPS = {
+    'braised beef used': 'Meat',
+    'braised chicken': 'Meat',
+    'braised pork': 'Meat',
+    'chicken wings': 'Meat',
+    'green onion': 'Produce',
+    'white onion': 'Produce',
+    'cilantro': 'Produce',
+    'boychoy': 'Produce',
+    'bokchoy': 'Produce',
+    'pickle cabbage': 'Produce',
+    'peas': 'Frozen',
+    'carrot': 'Frozen',
+    'rice': 'Dry Goods',
+    'rice noodles': 'Dry Goods',
+    'ramen': 'Dry Goods',
+    'flour': 'Dry Goods',
+    'tapioca starch': 'Dry Goods',
+    'egg': 'Eggs',
+}
+
+# Shelf life in days (editable). Unlisted ingredients use DEFAULT_SHELF_LIFE_DAYS.
+SHELF_LIFE_DAYS = {
+    'braised beef used': 4,
+    'braised chicken': 4,
+    'braised pork': 4,
+    'chicken wings': 4,
+    'green onion': 7,
+    'cilantro': 5,
+    'boychoy': 5,
+    'bokchoy': 5,
+    'white onion': 30,
+    'pickle cabbage': 30,
+    'peas': 90,
+    'carrot': 90,
+    'egg': 28,
+    'rice': 365,
+    'rice noodles': 180,
+    'ramen': 180,
+    'flour': 180,
+    'tapioca starch': 365,
+}
+DEFAULT_SHELF_LIFE_DAYS = 14
+
+
+def daily_demand_matrix(forecast_df):
+    """Expand monthly forecasts into a days x ingredients usage matrix"""
+    monthly = forecast_df.pivot_table(
+        index='period', columns='ingredient', values='forecasted_usage', aggfunc='sum'
+    ).sort_index().fillna(0)
+    start = monthly.index.min()
+    end = monthly.index.max() + pd.offsets.MonthEnd(1)
+    days = pd.date_range(start, end, freq='D')
+    # Each day takes the usage rate of its month
+    month_idx = monthly.index.searchsorted(days, side='right') - 1
+    usage = monthly.to_numpy()[month_idx] / (WEEKS_PER_MONTH * 7)
+    return days, list(monthly.columns), usage
+
+
+def build_delivery_schedule(forecast_df, on_hand=None, safety_days=DEFAULT_SAFETY_DAYS,
+                            supplier_groups=None, shelf_life_days=None):
+    """Plan consolidated deliveries from forecast demand
+
+    on_hand maps ingredient -> starting stock in the forecast's units; missing
+    ingredients start empty. Returns (deliveries, stock, risks) DataFrames:
+    one row per ingredient per delivery day, projected end-of-day stock, and
+    per ingredient the days spent below the safety floor and any demand left
+    unmet. Shelf limited ingredients spoil before one order can cover a day
+    plus the safety floor, so they cannot be kept above it.
+    """
+    supplier_groups = SUPPLIER_GROUPS if supplier_groups is None else supplier_groups
+    shelf_life_days = SHELF_LIFE_DAYS if shelf_life_days is None else shelf_life_days
+    on_hand = on_hand or {}
+
+    days, ingredients, usage = daily_demand_matrix(forecast_df)
+    suppliers = [supplier_groups.get(ing, ing.title()) for ing in ingredients]
+    group_ids, group_names = pd.factorize(pd.Series(suppliers))
+
+    shelf_days = np.array([shelf_life_days.get(ing, DEFAULT_SHELF_LIFE_DAYS) for ing in ingredients], dtype=float)
+    cover_days = np.minimum(shelf_days, MAX_COVER_WEEKS * 7)
+    stock = np.array([on_hand.get(ing, 0.0) or 0.0 for ing in ingredients], dtype=float)
+    stock = np.maximum(stock, 0)
+
+    delivered = np.zeros_like(usage)
+    end_stock = np.zeros_like(usage)
+    below_floor = np.zeros(len(ingredients), dtype=int)
+    unmet = np.zeros(len(ingredients))
+
+    for d in range(len(days)):
+        daily = usage[d]
+        floor = daily * safety_days
+        short = (stock - daily) < floor
+        # One short member triggers a delivery for the whole supplier group
+        group_short = np.bincount(group_ids, weights=short, minlength=len(group_names)) > 0
+        deliver = group_short[group_ids]
+        # Never order more than is used before it spoils
+        target = np.minimum(floor + daily * cover_days, daily * shelf_days)
+        qty = np.where(deliver, np.maximum(target - stock, 0), 0)
+        stock = stock + qty - daily
+        unmet += np.maximum(-stock, 0)
+        stock = np.maximum(stock, 0)
+        below_floor += stock < floor * (1 - 1e-9)
+        delivered[d] = qty
+        end_stock[d] = stock
+
+    d_idx, i_idx = np.nonzero(delivered > 0)
+    deliveries = pd.DataFrame({
+        'date': days[d_idx],
+        # Weeks are counted from the start of the horizon
+        'week_start': days[d_idx - d_idx % 7],
+        'supplier': np.asarray(suppliers, dtype=object)[i_idx],
+        'ingredient': np.asarray(ingredients, dtype=object)[i_idx],
+        'quantity': delivered[d_idx, i_idx],
+        'weekly_usage': usage[d_idx, i_idx] * 7,
+    })
+    stock_df = pd.DataFrame(end_stock, index=days, columns=ingredients)
+    stock_df.index.name = 'date'
+    risks = pd.DataFrame({
+        'ingredient': ingredients,
+        'supplier': suppliers,
+        'shelf_life_days': shelf_days,
+        'shelf_limited': shelf_days < safety_days + 1,
+        'days_below_floor': below_floor,
+        'unmet_demand': unmet,
+    })
+    return deliveries, stock_df, risks
+
+
+def delivery_calendar(deliveries):
+    """Supplier x week grid with the number of drops each week"""
+    if deliveries.empty:
+        return pd.DataFrame()
+    return deliveries.pivot_table(
+        index='supplier', columns='week_start', values='date', aggfunc='nunique', fill_value=0
+    )
@@ -0,0 +1,264 @@
+import hashlib
+import importlib.util
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# REPORT EXPORT SERVICE
+# ============================================================================
+# Builds CSV, Excel and PDF files for dashboard tables on a small worker
+# pool, so a page rerun only submits a job and never waits for a file to be
+# written. Writers consume tables as an iterator of DataFrame chunks and
+# write each chunk as it arrives. Finished files are stored on disk and keyed
+# by report and data version, so repeat requests for unchanged data are
+# served from the cache. Excel needs openpyxl and PDF needs fpdf2; formats
+# whose library is missing are simply not offered.
+
+EXPORT_DIR = '.exports'
+CHUNK_ROWS = 5000
+MAX_WORKERS = 2
+
+FORMATS = {
+    'csv': {'label': 'CSV', 'mime': 'text/csv', 'requires': None},
+    'xlsx': {
+        'label': 'Excel',
+        'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'requires': 'openpyxl',
+    },
+    'pdf': {'label': 'PDF', 'mime': 'application/pdf', 'requires': 'fpdf'},
+}
+
+READY = 'ready'
+RUNNING = 'running'
+FAILED = 'failed'
+MISSING = 'missing'
+
+
+class ExportError(Exception):
+    """Export could not be produced"""
+
+
+def available_formats():
+    """Formats whose writer library is installed"""
+    return [
+        fmt for fmt, spec in FORMATS.items()
+        if spec['requires'] is None or importlib.util.find_spec(spec['requires']) is not None
+    ]
+
+
+def data_version(*frames):
+    """Short content hash identifying a version of the source data"""
+    digest = hashlib.sha1()
+    for frame in frames:
+        digest.update(','.join(map(str, frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:12]
+
+
+def frame_chunks(df, chunk_rows=CHUNK_ROWS):
+    """Yield row slices of a DataFrame"""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+# ----------------------------------------------------------------------------
+# Report tables
+# ----------------------------------------------------------------------------
+
+def inventory_status_table(alerts_df, units):
+    """Complete ingredient status report, most urgent first"""
+    table = pd.DataFrame({
+        'Ingredient': alerts_df['ingredient'],
+        'Unit': alerts_df['ingredient'].map(units).fillna('units'),
+        'On Hand': alerts_df['on_hand'] if 'on_hand' in alerts_df else np.nan,
+        'Total Usage (Historical)': alerts_df['total_usage'],
+        'Weekly Usage (Forecast)': alerts_df['forecasted_weekly_usage'],
+        'Days Until Empty': alerts_df['forecasted_days_until_depletion'].round(1),
+        'Alert Status': alerts_df['forecasted_alert'],
+    })
+    return table.sort_values('Days Until Empty', na_position='last').reset_index(drop=True)
+
+
+def reorder_recommendations_table(alerts_df, units):
+    """Ingredients flagged Critical, Urgent or Reorder Soon"""
+    needs = alerts_df[alerts_df['forecasted_alert'].str.contains('Critical|Urgent|Soon', na=False)]
+    table = pd.DataFrame({
+        'Ingredient': needs['ingredient'],
+        'Unit': needs['ingredient'].map(units).fillna('units'),
+        'Weekly Usage (Forecasted)': needs['forecasted_weekly_usage'],
+        'Days Until Empty': needs['forecasted_days_until_depletion'].round(1),
+        'Alert Status': needs['forecasted_alert'],
+    })
+    return table.sort_values('Days Until Empty', na_position='last').reset_index(drop=True)
+
+
+def forecast_table_chunks(forecast_df, units, chunk_rows=CHUNK_ROWS):
+    """Forecast rows with interval bounds, shaped one chunk at a time"""
+    order = forecast_df.sort_values(['ingredient', 'period']).index
+    bounds = [c for c in ('lower_80', 'upper_80', 'lower_95', 'upper_95') if c in forecast_df]
+    for start in range(0, max(len(order), 1), chunk_rows):
+        rows = forecast_df.loc[order[start:start + chunk_rows]]
+        chunk = pd.DataFrame({
+            'Ingredient': rows['ingredient'],
+            'Month': pd.to_datetime(rows['period']).dt.strftime('%B %Y'),
+            'Unit': rows['ingredient'].map(units).fillna('units'),
+            'Forecasted Usage': rows['forecasted_usage'].round(1),
+        })
+        for col in bounds:
+            side, level = col.split('_')
+            chunk[f'{side.title()} {level}%'] = rows[col].round(1)
+        chunk['Trend Strength'] = rows['trend_strength'].str.capitalize()
+        chunk['R-Squared'] = rows['r_squared'].round(3)
+        yield chunk.reset_index(drop=True)
+
+
+# ----------------------------------------------------------------------------
+# Writers: each consumes an iterator of chunks
+# ----------------------------------------------------------------------------
+
+def _python_rows(chunk):
+    """Chunk rows as plain Python values, NaN as None"""
+    return chunk.astype(object).where(chunk.notna(), None).to_numpy().tolist()
+
+
+def write_csv(chunks, path, title):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=(i == 0), index=False)
+
+
+def write_xlsx(chunks, path, title):
+    from openpyxl import Workbook
+
+    # Write-only mode streams rows to disk instead of holding the sheet
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title[:31])
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            ws.append(list(chunk.columns))
+        for row in _python_rows(chunk):
+            ws.append(row)
+    wb.save(path)
+
+
+def _pdf_text(value):
+    """Cell text in the core PDF fonts' latin-1 range"""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        value = f"{value:,.1f}"
+    return str(value).encode('latin-1', 'ignore').decode('latin-1').strip()
+
+
+def write_pdf(chunks, path, title):
+    from fpdf import FPDF
+
+    pdf = FPDF(orientation='L', format='A4')
+    pdf.set_auto_page_break(False)
+    pdf.add_page()
+    pdf.set_font('Helvetica', 'B', 14)
+    pdf.cell(0, 10, _pdf_text(f"Mai Shan Yun - {title}"), new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('Helvetica', '', 8)
+    pdf.cell(0, 6, f"Generated {pd.Timestamp.now():%B %d, %Y at %I:%M %p}", new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(2)
+
+    row_height = 6
+    widths = None
+    header = None
+
+    def draw_row(cells, bold=False):
+        pdf.set_font('Helvetica', 'B' if bold else '', 8)
+        for width, text in zip(widths, cells):
+            # Trim text that would overflow its column
+            while text and pdf.get_string_width(text) > width - 2:
+                text = text[:-1]
+            pdf.cell(width, row_height, text, border=1)
+        pdf.ln(row_height)
+
+    for chunk in chunks:
+        if widths is None:
+            header = [_pdf_text(c) for c in chunk.columns]
+            # First column (names) gets double width
+            weights = np.array([2.0] + [1.0] * (len(header) - 1))
+            widths = weights / weights.sum() * pdf.epw
+            draw_row(header, bold=True)
+        for row in _python_rows(chunk):
+            if pdf.get_y() + row_height > pdf.h - pdf.b_margin:
+                pdf.add_page()
+                draw_row(header, bold=True)
+            draw_row([_pdf_text(v) for v in row])
+    pdf.output(path)
+
+
+WRITERS = {'csv': write_csv, 'xlsx': write_xlsx, 'pdf': write_pdf}
+
+
+class ExportService:
+    """Background export jobs with an on-disk artifact cache"""
+
+    def __init__(self, export_dir=EXPORT_DIR, max_workers=MAX_WORKERS):
+        self.export_dir = export_dir
+        os.makedirs(export_dir, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, report, fmt, version):
+        return os.path.join(self.export_dir, f"{report}_{version}.{fmt}")
+
+    def request(self, report, fmt, version, chunks, title):
+        """Queue an export unless it is cached or already running
+
+        `chunks` is a zero-argument callable returning an iterator of
+        DataFrames; it is only called on the worker. Returns the job key.
+        """
+        if fmt not in WRITERS:
+            raise ExportError(f"Unknown export format: {fmt}")
+        path = self.path_for(report, fmt, version)
+        with self._lock:
+            job = self._jobs.get(path)
+            if os.path.exists(path) or (job is not None and not job.done()):
+                return path
+            self._jobs[path] = self._pool.submit(self._build, report, fmt, path, chunks, title)
+        return path
+
+    def _build(self, report, fmt, path, chunks, title):
+        tmp = f"{path}.tmp"
+        try:
+            WRITERS[fmt](chunks(), tmp, title)
+            os.replace(tmp, path)
+        except ImportError as e:
+            raise ExportError(f"{FORMATS[fmt]['label']} export needs the {e.name} package") from e
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._prune(report, fmt, path)
+
+    def _prune(self, report, fmt, keep):
+        """Drop artifacts for older data versions of the same report"""
+        prefix = f"{report}_"
+        for name in os.listdir(self.export_dir):
+            full = os.path.join(self.export_dir, name)
+            version = name[len(prefix):-len(fmt) - 1]
+            if name.startswith(prefix) and name.endswith(f".{fmt}") and version.isalnum() and full != keep:
+                os.remove(full)
+
+    def status(self, key):
+        """(state, error) for a job key"""
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is not None and not job.done():
+            return RUNNING, None
+        if job is not None and job.exception() is not None:
+            return FAILED, str(job.exception())
+        if os.path.exists(key):
+            return READY, None
+        return MISSING, None
+
+    def read(self, key):
+        with open(key, 'rb') as f:
+            return f.read()
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# BATCH LINEAR FORECASTING WITH PREDICTION INTERVALS
+# ============================================================================
+# Same least-squares trend as BLOCK 16 of the notebook, fitted for every row
+# of a (series x periods) matrix at once. Intervals are either analytic (OLS
+# prediction interval with Student-t critical values) or a residual bootstrap
+# that refits every resample of a block of series in one array pass.
+
+INTERVAL_LEVELS = (80, 95)
+REORDER_LEVEL = 80  # upper bound used for days-to-depletion
+DEFAULT_BOOTSTRAP_SAMPLES = 1000
+BOOTSTRAP_BLOCK_CELLS = 2_000_000  # bounds the resample array per block
+
+# Two-sided Student-t critical values by degrees of freedom (1-30)
+T_CRITICAL = {
+    80: [3.078, 1.886, 1.638, 1.533, 1.476, 1.440, 1.415, 1.397, 1.383, 1.372,
+         1.363, 1.356, 1.350, 1.345, 1.341, 1.337, 1.333, 1.330, 1.328, 1.325,
+         1.323, 1.321, 1.319, 1.318, 1.316, 1.315, 1.314, 1.313, 1.311, 1.310],
+    95: [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+         2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+         2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042],
+}
+Z_CRITICAL = {80: 1.282, 95: 1.960}
+
+
+def t_critical(level, dof):
+    """Vectorized two-sided t critical value; normal beyond 30 dof"""
+    table = np.asarray(T_CRITICAL[level])
+    dof = np.asarray(dof)
+    values = table[np.clip(dof, 1, len(table)) - 1]
+    return np.where(dof > len(table), Z_CRITICAL[level], values)
+
+
+def _fit(y, valid, x):
+    """Row-wise OLS on masked data, returns (slope, intercept, n)"""
+    n = valid.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = np.where(valid, x, 0).sum(axis=-1) / n
+        y_mean = np.where(valid, y, 0).sum(axis=-1) / n
+        dx = np.where(valid, x - x_mean[..., None], 0)
+        dy = np.where(valid, y - y_mean[..., None], 0)
+        denom = (dx ** 2).sum(axis=-1)
+        slope = np.where(denom > 0, (dx * dy).sum(axis=-1) / denom, 0.0)
+    intercept = y_mean - slope * x_mean
+    return slope, intercept, n
+
+
+def linear_forecast(matrix, periods_ahead=3):
+    """Least-squares trend for every row at once
+
+    Returns (forecast, summary): forecast is a rows x periods_ahead array of
+    non-negative projections; summary holds slope, r_squared, trend_strength.
+    """
+    y = matrix.to_numpy(dtype=float)
+    valid = ~np.isnan(y)
+    x = np.broadcast_to(np.arange(y.shape[1], dtype=float), y.shape)
+    slope, intercept, _ = _fit(y, valid, x)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y_mean = np.where(valid, y, 0).sum(axis=1) / valid.sum(axis=1)
+        ss_res = (np.where(valid, y - (slope[:, None] * x + intercept[:, None]), 0) ** 2).sum(axis=1)
+        ss_tot = (np.where(valid, y - y_mean[:, None], 0) ** 2).sum(axis=1)
+        r_squared = np.where(ss_tot > 0, 1 - ss_res / ss_tot, 0.0)
+
+    future_x = np.arange(y.shape[1], y.shape[1] + periods_ahead)
+    forecast = np.maximum(slope[:, None] * future_x + intercept[:, None], 0)
+
+    trend = np.select([r_squared > 0.7, r_squared > 0.4], ['strong', 'moderate'], 'weak')
+    summary = pd.DataFrame({
+        'slope': slope,
+        'r_squared': r_squared,
+        'trend_strength': trend,
+    }, index=matrix.index)
+    return forecast, summary
+
+
+def analytic_intervals(matrix, periods_ahead=3, levels=INTERVAL_LEVELS):
+    """OLS prediction intervals, returns {level: (lower, upper)}"""
+    y = matrix.to_numpy(dtype=float)
+    valid = ~np.isnan(y)
+    x = np.broadcast_to(np.arange(y.shape[1], dtype=float), y.shape)
+    slope, intercept, n = _fit(y, valid, x)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = np.where(valid, x, 0).sum(axis=1) / n
+        sxx = (np.where(valid, x - x_mean[:, None], 0) ** 2).sum(axis=1)
+        resid = np.where(valid, y - (slope[:, None] * x + intercept[:, None]), 0)
+        dof = np.maximum(n - 2, 1)
+        s = np.sqrt((resid ** 2).sum(axis=1) / dof)
+
+        future_x = np.arange(y.shape[1], y.shape[1] + periods_ahead)
+        point = slope[:, None] * future_x + intercept[:, None]
+        se = s[:, None] * np.sqrt(1 + 1 / n[:, None] + (future_x - x_mean[:, None]) ** 2 / sxx[:, None])
+
+    intervals = {}
+    for level in levels:
+        half = t_critical(level, dof)[:, None] * se
+        # Too few points to estimate spread: collapse to the point forecast
+        half = np.where(np.isfinite(half), half, 0)
+        intervals[level] = (np.maximum(point - half, 0), np.maximum(point + half, 0))
+    return intervals
+
+
+def _bootstrap_block(y, periods_ahead, levels, n_boot, rng):
+    """Residual bootstrap for one block of rows"""
+    valid = ~np.isnan(y)
+    rows, cols = y.shape
+    x = np.broadcast_to(np.arange(cols, dtype=float), y.shape)
+    slope, intercept, n = _fit(y, valid, x)
+
+    fitted = slope[:, None] * x + intercept[:, None]
+    # Inflate residuals for the two fitted parameters
+    inflate = np.sqrt(n / np.maximum(n - 2, 1))
+    resid = np.where(valid, (y - fitted) * inflate[:, None], np.nan)
+
+    # Pack each row's valid residuals to the front so draws index [0, n)
+    order = np.argsort(~valid, axis=1, kind='stable')
+    packed = np.broadcast_to(np.take_along_axis(resid, order, axis=1), (n_boot, rows, cols))
+    n_safe = np.maximum(n, 1)[None, :, None]
+
+    def draw(size):
+        idx = np.minimum((rng.random((n_boot, rows, size)) * n_safe).astype(int), cols - 1)
+        return np.nan_to_num(np.take_along_axis(packed, idx, axis=2))
+
+    y_star = fitted[None] + draw(cols)
+    b_slope, b_intercept, _ = _fit(y_star, np.broadcast_to(valid, y_star.shape), np.broadcast_to(x, y_star.shape))
+
+    future_x = np.arange(cols, cols + periods_ahead)
+    sims = b_slope[..., None] * future_x + b_intercept[..., None] + draw(periods_ahead)
+
+    bounds = {}
+    for level in levels:
+        tail = (100 - level) / 2
+        lower, upper = np.percentile(sims, [tail, 100 - tail], axis=0)
+        bounds[level] = (np.maximum(lower, 0), np.maximum(upper, 0))
+    return bounds
+
+
+def bootstrap_intervals(matrix, periods_ahead=3, levels=INTERVAL_LEVELS,
+                        n_boot=DEFAULT_BOOTSTRAP_SAMPLES, seed=0):
+    """Residual-bootstrap prediction intervals, returns {level: (lower, upper)}
+
+    Resamples for a block of series are refitted together on a
+    (n_boot x series x periods) array; blocks keep that array bounded.
+    """
+    rng = np.random.default_rng(seed)
+    y = matrix.to_numpy(dtype=float)
+    block = max(1, BOOTSTRAP_BLOCK_CELLS // (n_boot * max(y.shape[1], 1)))
+
+    parts = [_bootstrap_block(y[i:i + block], periods_ahead, levels, n_boot, rng)
+             for i in range(0, len(y), block)]
+    return {
+        level: (np.vstack([p[level][0] for p in parts]), np.vstack([p[level][1] for p in parts]))
+        for level in levels
+    }
+
+
+def interval_frame(matrix, future_periods, levels=INTERVAL_LEVELS, method='analytic', **kwargs):
+    """Long table of interval bounds: one row per series and future period"""
+    if method == 'bootstrap':
+        intervals = bootstrap_intervals(matrix, len(future_periods), levels, **kwargs)
+    elif method == 'analytic':
+        intervals = analytic_intervals(matrix, len(future_periods), levels)
+    else:
+        raise ValueError(f"Unknown interval method: {method}")
+
+    frame = pd.DataFrame({
+        matrix.index.name or 'series': np.repeat(matrix.index.to_numpy(), len(future_periods)),
+        'period': np.tile(np.asarray(future_periods), len(matrix)),
+    })
+    for level, (lower, upper) in intervals.items():
+        frame[f'lower_{level}'] = lower.ravel()
+        frame[f'upper_{level}'] = upper.ravel()
+    return frame
@@ -0,0 +1,212 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+# ============================================================================
+# INVENTORY LEDGER
+# ============================================================================
+# Append-only log of shipment receipts and sales/usage events, backed by a
+# local SQLite file. On-hand quantities and days-to-depletion are kept in
+# memory and updated per event, so only the touched ingredient is re-scored.
+
+LEDGER_PATH = 'inventory_events.db'
+
+RECEIPT = 'receipt'
+USAGE = 'usage'
+EVENT_KINDS = (RECEIPT, USAGE)
+
+# Same tiers as BLOCK 19 of the notebook
+ALERT_CRITICAL = "🔴 Critical - Urgent Reorder"
+ALERT_SOON = "🟡 Reorder Soon"
+ALERT_SUFFICIENT = "🟢 Sufficient"
+ALERT_UNKNOWN = "⚠️ Unknown (No Forecast Data)"
+ALERT_NO_STOCK = "⚠️ Unknown (No Stock Data)"
+
+
+def get_forecast_alert(days):
+    """Map days until depletion to an alert tier"""
+    if days is None or pd.isna(days):
+        return ALERT_UNKNOWN
+    elif days < 7:
+        return ALERT_CRITICAL
+    elif days < 14:
+        return ALERT_SOON
+    else:
+        return ALERT_SUFFICIENT
+
+
+class InventoryLedger:
+    """Live on-hand state for every tracked ingredient"""
+
+    def __init__(self, reorder_df, path=LEDGER_PATH):
+        self.path = path
+        self.last_event_id = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts TEXT NOT NULL,
+                ingredient TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                quantity REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        self.state = {}
+        for _, row in reorder_df.iterrows():
+            # The batch pipeline assumes one shipment is on hand
+            on_hand = row.get('avg_quantity_per_shipment', row.get('avg_quantity_per_shipment_grams'))
+            # A shipment measured in another unit than the usage forecast
+            # (grams vs "units") cannot seed stock without mixing units
+            ship_unit, usage_unit = row.get('shipment_unit_code'), row.get('unit_code')
+            if pd.notna(ship_unit) and pd.notna(usage_unit) and int(ship_unit) != int(usage_unit):
+                on_hand = None
+            # Prefer the upper forecast bound so alerts err on the side of reordering
+            weekly = row.get('forecasted_weekly_usage_upper', row.get('forecasted_weekly_usage'))
+            self.state[row['ingredient']] = {
+                'on_hand': float(on_hand) if pd.notna(on_hand) else None,
+                'daily_usage': float(weekly) / 7 if pd.notna(weekly) and weekly > 0 else None,
+                'unit_code': int(usage_unit) if pd.notna(usage_unit) else None,
+                'days_until_depletion': None,
+                'alert': ALERT_UNKNOWN,
+                'last_event': None,
+            }
+            self._evaluate(row['ingredient'])
+
+        self.sync()
+
+    def _evaluate(self, ingredient):
+        """Recompute days until depletion and alert tier for one ingredient"""
+        entry = self.state[ingredient]
+        if entry['on_hand'] is None or entry['daily_usage'] is None:
+            days = None
+        else:
+            days = max(entry['on_hand'], 0) / entry['daily_usage']
+        entry['days_until_depletion'] = days
+        if entry['on_hand'] is None and entry['daily_usage'] is not None:
+            entry['alert'] = ALERT_NO_STOCK
+        else:
+            entry['alert'] = get_forecast_alert(days)
+
+    def _apply(self, event_id, ts, ingredient, kind, quantity):
+        """Fold a single event into the in-memory state"""
+        entry = self.state.get(ingredient)
+        if entry is None:
+            entry = self.state[ingredient] = {
+                'on_hand': None,
+                'daily_usage': None,
+                'unit_code': None,
+                'days_until_depletion': None,
+                'alert': ALERT_UNKNOWN,
+                'last_event': None,
+            }
+        on_hand = entry['on_hand']
+        if kind == RECEIPT:
+            # The first receipt for an ingredient of unknown stock starts tracking
+            entry['on_hand'] = quantity if on_hand is None else on_hand + quantity
+        elif on_hand is not None:
+            # Usage beyond what is on hand is a stockout, not negative stock
+            entry['on_hand'] = max(on_hand - quantity, 0.0)
+        entry['last_event'] = ts
+        self.last_event_id = event_id
+        self._evaluate(ingredient)
+
+    def sync(self):
+        """Apply events appended since the last sync, return affected ingredients"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, ts, ingredient, kind, quantity FROM events WHERE id > ? ORDER BY id",
+                (self.last_event_id,)
+            ).fetchall()
+            affected = set()
+            for event_id, ts, ingredient, kind, quantity in rows:
+                self._apply(event_id, ts, ingredient, kind, quantity)
+                affected.add(ingredient)
+            return affected
+
+    def record(self, ingredient, kind, quantity, ts=None):
+        """Append an event to the log, then apply every unseen event"""
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind: {kind}")
+        if quantity < 0:
+            raise ValueError("Event quantity must be non-negative")
+        ts = (ts or datetime.now()).isoformat(timespec='seconds')
+        self._append([(ts, ingredient, kind, float(quantity))])
+        return ingredient
+
+    def _append(self, events):
+        """Insert (ts, ingredient, kind, quantity) rows in one transaction"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO events (ts, ingredient, kind, quantity) VALUES (?, ?, ?, ?)",
+                events
+            )
+            self._conn.commit()
+        # Apply through sync so events other processes wrote before these
+        # are folded in first, in id order
+        self.sync()
+
+    def record_receipt(self, ingredient, quantity, ts=None):
+        """Record a shipment received for an ingredient"""
+        return self.record(ingredient, RECEIPT, quantity, ts)
+
+    def record_usage(self, ingredient, quantity, ts=None):
+        """Record ingredient consumed"""
+        return self.record(ingredient, USAGE, quantity, ts)
+
+    def record_sale(self, item_norm, count, bom_df, ts=None):
+        """Expand a menu item sale into usage events via the BOM
+
+        All of the sale's usage events are written in one transaction. BOM
+        lines for ingredients of unknown stock, or in a different unit than
+        the ingredient's stock, are skipped (bom_df should be unit-normalized,
+        with a unit_code column).
+        Returns the affected ingredients.
+        """
+        if count < 0:
+            raise ValueError("Sale count must be non-negative")
+        ts = (ts or datetime.now()).isoformat(timespec='seconds')
+        recipe = bom_df[bom_df['item_norm'] == item_norm]
+        events = []
+        for _, row in recipe.iterrows():
+            entry = self.state.get(row['ingredient_norm'])
+            if entry is None or entry['on_hand'] is None:
+                continue
+            if 'unit_code' in row.index and entry['unit_code'] is not None and int(row['unit_code']) != entry['unit_code']:
+                continue
+            events.append((ts, row['ingredient_norm'], USAGE, float(row['quantity_per_item'] * count)))
+        if events:
+            self._append(events)
+        return {event[1] for event in events}
+
+    def snapshot(self):
+        """Current state as a DataFrame keyed by ingredient"""
+        df = pd.DataFrame.from_dict(self.state, orient='index')
+        df.index.name = 'ingredient'
+        return df.reset_index()
+
+    def recent_events(self, limit=20):
+        """Most recent events from the log"""
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT id, ts, ingredient, kind, quantity FROM events ORDER BY id DESC LIMIT ?",
+                self._conn,
+                params=(limit,)
+            )
+
+
+def live_reorder_alerts(reorder_df, ledger):
+    """Overlay live ledger state on the batch reorder table"""
+    live = ledger.snapshot()[['ingredient', 'on_hand', 'days_until_depletion', 'alert']]
+    live = live.rename(columns={
+        'days_until_depletion': 'forecasted_days_until_depletion',
+        'alert': 'forecasted_alert'
+    })
+    merged = reorder_df.drop(columns=['forecasted_days_until_depletion', 'forecasted_alert'])
+    merged = merged.merge(live, on='ingredient', how='left')
+    merged['forecasted_alert'] = merged['forecasted_alert'].fillna(ALERT_UNKNOWN)
+    return merged
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# ROLLING KPI INDEX
+# ============================================================================
+# Orders and revenue are laid out on a regular period grid (monthly by
+# default, daily with freq='D') and turned into prefix sums once. Afterwards
+# the total for any range is the difference of two prefix values, and growth
+# between any two ranges is two such differences. Date ranges are mapped to
+# grid positions with a binary search, so a query costs the same whether the
+# history covers six months or ten years.
+
+MONTHLY = 'MS'
+DAILY = 'D'
+VALUE_COLS = ('count', 'amount')
+
+PREVIOUS_PERIOD = 'Previous period'
+PREVIOUS_YEAR = 'Same period last year'
+CUSTOM_RANGE = 'Custom range'
+COMPARISONS = [PREVIOUS_PERIOD, PREVIOUS_YEAR, CUSTOM_RANGE]
+
+
+class KpiIndex:
+    """Prefix sums of KPI columns over a regular period grid"""
+
+    def __init__(self, df, value_cols=VALUE_COLS, period_col='period', freq=MONTHLY):
+        self.freq = freq
+        self.value_cols = list(value_cols)
+
+        sums = df.groupby(pd.to_datetime(df[period_col]))[self.value_cols].sum()
+        grid = pd.date_range(sums.index.min(), sums.index.max(), freq=freq)
+        self.periods = grid
+        # Period ends: the day before the next period starts
+        self.ends = grid.shift(1) - pd.Timedelta(days=1)
+
+        # Leading zero so the sum of positions [i, j) is csum[j] - csum[i]
+        present = grid.isin(sums.index)
+        self._covered = np.concatenate([[0], np.cumsum(present)])
+        values = sums.reindex(grid, fill_value=0)
+        self._csum = {
+            col: np.concatenate([[0.0], np.cumsum(values[col].to_numpy(dtype=float))])
+            for col in self.value_cols
+        }
+
+    @property
+    def first_date(self):
+        return self.periods[0]
+
+    @property
+    def last_date(self):
+        return self.ends[-1]
+
+    def span(self, start, end):
+        """Grid positions [i, j) of the periods overlapping start..end"""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        i = max(int(self.periods.searchsorted(start, side='right')) - 1, 0)
+        j = int(self.periods.searchsorted(end, side='right'))
+        return i, max(j, i)
+
+    def totals(self, i, j, requested=None):
+        """Range totals for grid positions [i, j)
+
+        `requested` is the number of periods asked for; ranges that run past
+        either end of the history are reported as incomplete.
+        """
+        lo, hi = min(max(i, 0), len(self.periods)), min(max(j, 0), len(self.periods))
+        periods = hi - lo
+        requested = j - i if requested is None else requested
+        result = {
+            'start': self.periods[lo] if periods else None,
+            'end': self.ends[hi - 1] if periods else None,
+            'periods': periods,
+            'complete': bool(periods > 0 and periods == requested and self._covered[hi] - self._covered[lo] == periods),
+        }
+        for col in self.value_cols:
+            result[col] = self._csum[col][hi] - self._csum[col][lo]
+        return result
+
+    def between(self, start, end):
+        """Totals for the periods overlapping start..end"""
+        i, j = self.span(start, end)
+        return self.totals(i, j)
+
+    def previous(self, start, end):
+        """Totals for the same number of periods right before start..end"""
+        i, j = self.span(start, end)
+        n = j - i
+        return self.totals(i - n, i, requested=n)
+
+    def year_ago(self, start, end):
+        """Totals for start..end shifted back one year"""
+        i, j = self.span(start, end)
+        if j == i:
+            return self.totals(i, j)
+        offset = pd.DateOffset(years=1)
+        start, end = self.periods[i] - offset, self.ends[j - 1] - offset
+        # Periods the shifted range should hold, even where it predates the history
+        requested = len(pd.date_range(start, end, freq=self.freq))
+        if end < self.first_date:
+            return self.totals(0, 0, requested=requested)
+        k, m = self.span(start, end)
+        return self.totals(k, m, requested=requested)
+
+    def label(self, totals):
+        """Readable span of a range result, e.g. 'Aug 2025 – Oct 2025 (3 months)'"""
+        fmt, unit = ('%b %Y', 'month') if self.freq == MONTHLY else ('%b %d, %Y', 'day')
+        first, last = f"{totals['start']:{fmt}}", f"{totals['end']:{fmt}}"
+        span = first if first == last else f"{first} – {last}"
+        n = totals['periods']
+        return f"{span} ({n} {unit}{'s' if n != 1 else ''})"
+
+    def compare(self, current, baseline):
+        """Growth % of each KPI from baseline to current, NaN when not comparable"""
+        growth = {}
+        for col in self.value_cols:
+            base = baseline[col]
+            comparable = baseline['complete'] and current['complete'] and base > 0
+            growth[col] = (current[col] - base) / base * 100 if comparable else np.nan
+        return growth
@@ -0,0 +1,347 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ============================================================================
+# OPENROUTER CLIENT
+# ============================================================================
+# One client is shared by every Streamlit session. It owns a pooled HTTP
+# session, a token-bucket rate limiter, retries with exponential backoff and
+# a circuit breaker that fails fast while the upstream is unhealthy. Point
+# OPENROUTER_BASE_URL at llm_stub_server.py to exercise the failure paths.
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_MODEL = "anthropic/claude-3.7-sonnet"
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+# Upper bound on one chat() call: rate-limit wait, attempts and backoff together
+REQUEST_DEADLINE = 30
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Transport errors worth another attempt; other RequestExceptions are not
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+class LLMError(Exception):
+    """Base error for AI requests"""
+
+
+class LLMConfigError(LLMError):
+    """Client is missing configuration such as the API key"""
+
+
+class LLMRateLimited(LLMError):
+    """Local rate limit reached"""
+
+
+class LLMCircuitOpen(LLMError):
+    """Upstream marked unhealthy; request not attempted"""
+
+
+class LLMRequestError(LLMError):
+    """Request failed after all retries"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=0):
+        """Take one token, waiting up to `timeout` seconds; False if none"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, probes after `reset_timeout`"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Whether a request may go upstream; only one probe while half-open"""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """Free the half-open probe slot without judging upstream health"""
+        with self._lock:
+            self._probing = False
+
+
+class ClientMetrics:
+    """Rolling latency and outcome counters"""
+
+    def __init__(self, window=200, history=50):
+        self._latencies = deque(maxlen=window)
+        self._requests = deque(maxlen=history)
+        self._counts = {
+            'requests': 0,
+            'successes': 0,
+            'failures': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'circuit_rejected': 0,
+        }
+        self._lock = threading.Lock()
+
+    def incr(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def record_request(self, **record):
+        """Keep a per-request record (prompt size, latency, outcome)"""
+        with self._lock:
+            self._requests.append(record)
+
+    def recent_requests(self):
+        """Per-request records, newest first"""
+        with self._lock:
+            return list(reversed(self._requests))
+
+    def snapshot(self):
+        """Counts plus latency percentiles (seconds) and error rate"""
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = sorted(self._latencies)
+        finished = counts['successes'] + counts['failures']
+        counts['error_rate'] = counts['failures'] / finished if finished else 0.0
+        counts['latency_p50'] = latencies[len(latencies) // 2] if latencies else None
+        counts['latency_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+        return counts
+
+
+class LLMClient:
+    """Chat completions client with pooling, rate limiting, retries and a breaker"""
+
+    def __init__(self, api_key=None, base_url=None, model=DEFAULT_MODEL,
+                 rate_per_minute=30, burst=5, pool_size=10,
+                 max_retries=MAX_RETRIES, failure_threshold=3, reset_timeout=30,
+                 deadline=REQUEST_DEADLINE):
+        self.api_key = api_key or os.getenv('OPENROUTER_API_KEY')
+        self.base_url = (base_url or os.getenv('OPENROUTER_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.model = model
+        self.max_retries = max_retries
+        self.deadline = deadline
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.limiter = TokenBucket(rate_per_minute / 60, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = ClientMetrics()
+
+    def _backoff(self, attempt, retry_after=None):
+        """Exponential backoff with full jitter, honouring Retry-After"""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                pass
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def chat(self, messages, rate_wait=10, tag=None, prompt_tokens=None):
+        """Send chat messages and return the reply text
+
+        Raises an LLMError subclass on any failure, and gives up once
+        `deadline` seconds have passed. Every call is recorded with its
+        prompt size and end-to-end latency, retries included. The
+        provider's token usage is recorded when it reports one, otherwise
+        the caller's `prompt_tokens` estimate.
+        """
+        prompt_chars = sum(len(m.get('content', '')) for m in messages)
+        started = time.monotonic()
+        usage = {}
+        outcome = 'ok'
+        try:
+            content, usage = self._send(messages, rate_wait)
+            return content
+        except LLMError as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            self.metrics.record_request(
+                time=time.time(),
+                tag=tag,
+                prompt_chars=prompt_chars,
+                prompt_tokens=usage.get('prompt_tokens', prompt_tokens),
+                completion_tokens=usage.get('completion_tokens'),
+                latency=time.monotonic() - started,
+                outcome=outcome,
+            )
+
+    def _send(self, messages, rate_wait):
+        """One logical request: rate limit, breaker, retries; returns (content, usage)"""
+        if not self.api_key:
+            raise LLMConfigError("OPENROUTER_API_KEY environment variable not set")
+
+        deadline = time.monotonic() + self.deadline
+        self.metrics.incr('requests')
+        if not self.limiter.acquire(timeout=min(rate_wait, self.deadline)):
+            self.metrics.incr('rate_limited')
+            raise LLMRateLimited("Too many AI requests right now, please try again shortly")
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self.breaker.allow():
+                # Tripped by this request's own retries: that is a failure too
+                self.metrics.incr('failures' if attempt > 0 else 'circuit_rejected')
+                raise LLMCircuitOpen("AI service is temporarily unavailable, please try again later")
+            if attempt > 0:
+                self.metrics.incr('retries')
+
+            started = time.monotonic()
+            retry_after = None
+            # Set once the breaker has been told how this attempt went
+            settled = False
+            try:
+                try:
+                    response = self.session.post(
+                        f"{self.base_url}/chat/completions",
+                        headers={
+                            "Authorization": f"Bearer {self.api_key}",
+                            "Content-Type": "application/json"
+                        },
+                        json={"model": self.model, "messages": messages},
+                        timeout=(min(CONNECT_TIMEOUT, remaining), min(READ_TIMEOUT, remaining))
+                    )
+                except TRANSIENT_ERRORS as e:
+                    last_error = LLMRequestError(f"Could not reach AI service: {e}")
+                except requests.RequestException as e:
+                    # Bad base URL and the like: retrying cannot help, and
+                    # says nothing about the upstream's health
+                    self.metrics.incr('failures')
+                    raise LLMRequestError(f"Could not send AI request: {e}") from e
+                else:
+                    self.metrics.observe(time.monotonic() - started)
+                    if response.status_code == 200:
+                        try:
+                            result = response.json()
+                            content = result['choices'][0]['message']['content']
+                        except (ValueError, KeyError, IndexError):
+                            last_error = LLMRequestError("AI service returned an unexpected response", 200)
+                        else:
+                            self.breaker.record_success()
+                            settled = True
+                            self.metrics.incr('successes')
+                            return content, result.get('usage') or {}
+                    elif response.status_code in RETRYABLE_STATUS:
+                        retry_after = response.headers.get('Retry-After')
+                        last_error = LLMRequestError(
+                            f"AI service error {response.status_code}", response.status_code
+                        )
+                    else:
+                        # Client errors (bad key, bad request) will not improve on retry
+                        self.breaker.record_success()
+                        settled = True
+                        self.metrics.incr('failures')
+                        raise LLMRequestError(
+                            f"AI service error {response.status_code}: {response.text[:200]}",
+                            response.status_code
+                        )
+
+                self.breaker.record_failure()
+                settled = True
+            finally:
+                # Never leave a half-open probe slot taken, or the breaker
+                # would refuse every request from then on
+                if not settled:
+                    self.breaker.release()
+
+            if attempt < self.max_retries:
+                delay = self._backoff(attempt, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    break
+                time.sleep(delay)
+        else:
+            self.metrics.incr('failures')
+            raise last_error
+
+        # Out of time before the retries ran out
+        self.metrics.incr('failures')
+        reason = f": {last_error}" if last_error is not None else ""
+        raise LLMRequestError(
+            f"AI service did not answer within {self.deadline:.0f}s{reason}",
+            getattr(last_error, 'status_code', None)
+        )
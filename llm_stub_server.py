@@ -0,0 +1,230 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================================================================
+# FAULT-INJECTING OPENROUTER STUB
+# ============================================================================
+# Local stand-in for the chat completions endpoint, for exercising
+# llm_client.py without spending API credits. Each request is answered
+# normally or with an injected fault (error status, 429 with Retry-After,
+# slow response or dropped connection) at the configured rates.
+#
+#   python llm_stub_server.py --error-rate 0.5
+#   python llm_stub_server.py --error-rate 0.3 --throttle-rate 0.1 --check
+#   OPENROUTER_BASE_URL=http://127.0.0.1:8765/api/v1 OPENROUTER_API_KEY=test \
+#       streamlit run dashboard.py
+
+
+class FaultConfig:
+    """Probabilities and timings for injected faults"""
+
+    def __init__(self, error_rate=0.0, throttle_rate=0.0, slow_rate=0.0, drop_rate=0.0,
+                 error_status=503, slow_seconds=40.0, latency=0.2, retry_after=1):
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.slow_rate = slow_rate
+        self.drop_rate = drop_rate
+        self.error_status = error_status
+        self.slow_seconds = slow_seconds
+        self.latency = latency
+        self.retry_after = retry_after
+        # Outcomes to serve before falling back to the random rates
+        self.script = deque()
+
+    def pick(self):
+        """Choose the outcome for one request"""
+        if self.script:
+            return self.script.popleft()
+        roll = random.random()
+        for fault, rate in (('drop', self.drop_rate), ('throttle', self.throttle_rate),
+                            ('error', self.error_rate), ('slow', self.slow_rate)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return 'ok'
+
+
+def make_handler(config):
+    """Request handler bound to a fault config"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not self.path.endswith('/chat/completions'):
+                self._send_json(404, {'error': {'message': 'not found'}})
+                return
+            if not self.headers.get('Authorization', '').startswith('Bearer '):
+                self._send_json(401, {'error': {'message': 'missing API key'}})
+                return
+
+            fault = config.pick()
+            if fault == 'drop':
+                self.close_connection = True
+                self.connection.close()
+                return
+            if fault == 'throttle':
+                self._send_json(429, {'error': {'message': 'rate limited'}},
+                                {'Retry-After': str(config.retry_after)})
+                return
+            if fault == 'error':
+                self._send_json(config.error_status, {'error': {'message': 'injected failure'}})
+                return
+
+            time.sleep(config.slow_seconds if fault == 'slow' else config.latency)
+            prompt = request.get('messages', [{}])[-1].get('content', '')
+            reply = f"## Stub Analysis\n\nReceived {len(prompt)} characters of context."
+            self._send_json(200, {
+                'model': request.get('model'),
+                'choices': [{'message': {'role': 'assistant', 'content': reply}}],
+                'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(reply) // 4},
+            })
+
+        def log_message(self, format, *args):
+            print(f"[stub] {self.address_string()} {format % args}")
+
+    return StubHandler
+
+
+def serve(config, host='127.0.0.1', port=8765):
+    """Start the stub in a background thread and return the server"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _expect(violations, condition, message):
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        violations.append(message)
+
+
+def _send(client, text):
+    """One chat call; returns the error class name or 'ok'"""
+    from llm_client import LLMError
+
+    try:
+        client.chat([{'role': 'user', 'content': text}])
+        return 'ok'
+    except LLMError as e:
+        return type(e).__name__
+
+
+def run_check(base_url, config, requests_to_send=20):
+    """Drive the real client through scripted faults and assert how it copes
+
+    Returns the list of violated expectations; empty means every check held.
+    The configured random fault rates are applied afterwards for a batch of
+    requests, where only the metric totals are checked.
+    """
+    from llm_client import LLMClient, CircuitBreaker
+
+    reset_timeout = 2
+    client = LLMClient(api_key='stub', base_url=base_url, rate_per_minute=600, burst=requests_to_send + 10,
+                       max_retries=3, failure_threshold=3, reset_timeout=reset_timeout)
+    rates = (config.error_rate, config.throttle_rate, config.slow_rate, config.drop_rate)
+    config.error_rate = config.throttle_rate = config.slow_rate = config.drop_rate = 0.0
+    violations = []
+    calls = 0
+
+    print("Retries under injected 5xx and 429")
+    config.script.extend(['error', 'throttle'])
+    before = client.metrics.snapshot()
+    outcome = _send(client, 'retry check')
+    calls += 1
+    after = client.metrics.snapshot()
+    _expect(violations, outcome == 'ok', f"request succeeds after two faults (got {outcome})")
+    _expect(violations, after['retries'] - before['retries'] == 2,
+            f"two retries recorded (got {after['retries'] - before['retries']})")
+    _expect(violations, client.breaker.state == CircuitBreaker.CLOSED, "breaker stays closed")
+
+    print("Breaker opens under sustained errors")
+    config.error_rate = 1.0
+    outcome = _send(client, 'trip check')
+    calls += 1
+    _expect(violations, outcome in ('LLMCircuitOpen', 'LLMRequestError'), f"request fails (got {outcome})")
+    _expect(violations, client.breaker.state == CircuitBreaker.OPEN,
+            f"breaker open after {client.breaker.failure_threshold} failures (got {client.breaker.state})")
+    rejected = client.metrics.snapshot()['circuit_rejected']
+    outcome = _send(client, 'open check')
+    calls += 1
+    _expect(violations, outcome == 'LLMCircuitOpen', f"next request fails fast (got {outcome})")
+    _expect(violations, client.metrics.snapshot()['circuit_rejected'] == rejected + 1, "rejection counted")
+
+    print(f"Breaker recovers after {reset_timeout}s")
+    config.error_rate = 0.0
+    time.sleep(reset_timeout + 0.1)
+    _expect(violations, client.breaker.state == CircuitBreaker.HALF_OPEN,
+            f"breaker half-open (got {client.breaker.state})")
+    outcome = _send(client, 'probe check')
+    calls += 1
+    _expect(violations, outcome == 'ok', f"probe request succeeds (got {outcome})")
+    _expect(violations, client.breaker.state == CircuitBreaker.CLOSED,
+            f"breaker closed again (got {client.breaker.state})")
+
+    config.error_rate, config.throttle_rate, config.slow_rate, config.drop_rate = rates
+    if any(rates):
+        print(f"Batch of {requests_to_send} under the configured fault rates")
+        for i in range(requests_to_send):
+            outcome = _send(client, f'request {i}')
+            calls += 1
+            print(f"  {i:3d} breaker={client.breaker.state:9s} {outcome}")
+            time.sleep(0.3)
+
+    print("Metrics add up")
+    metrics = client.metrics.snapshot()
+    settled = metrics['successes'] + metrics['failures'] + metrics['rate_limited'] + metrics['circuit_rejected']
+    _expect(violations, metrics['requests'] == calls, f"{calls} requests counted (got {metrics['requests']})")
+    _expect(violations, settled == metrics['requests'],
+            f"every request ends as exactly one outcome ({settled} of {metrics['requests']})")
+    _expect(violations, len(client.metrics.recent_requests()) == min(calls, 50),
+            "one per-request record per call")
+    print(json.dumps(metrics, indent=2))
+    return violations
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fault-injecting OpenRouter stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--slow-rate', type=float, default=0.0)
+    parser.add_argument('--slow-seconds', type=float, default=40.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--check', action='store_true',
+                        help='start the stub, check llm_client retries, breaker and metrics against it, and exit non-zero on failure')
+    args = parser.parse_args()
+
+    config = FaultConfig(args.error_rate, args.throttle_rate, args.slow_rate, args.drop_rate,
+                         args.error_status, args.slow_seconds, args.latency)
+    server = serve(config, args.host, args.port)
+    print(f"Stub listening on http://{args.host}:{args.port}/api/v1/chat/completions")
+    if args.check:
+        violations = run_check(f"http://{args.host}:{args.port}/api/v1", config)
+        server.shutdown()
+        print(f"\n{len(violations)} check(s) failed" if violations else "\nAll checks passed")
+        sys.exit(1 if violations else 0)
+    else:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,167 @@
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# AI PROMPT CONTEXT BUILDER
+# ============================================================================
+# Joins the forecast, seasonal, reorder and cost tables into one fact row per
+# ingredient, then renders the ingredients asked about into compact text that
+# fits a token budget. When the full text is too long, the lowest-priority
+# fields are dropped first. If it is still too long, the least urgent
+# ingredients are folded into a one-line summary.
+
+CHARS_PER_TOKEN = 4  # rough average for English text and numbers
+DEFAULT_TOKEN_BUDGET = 1500
+TOKEN_BUDGETS = [500, 1000, 1500, 2500, 4000]
+
+# (section, label, column, format, priority). Priority 1 is always kept,
+# priority 3 goes first when over budget. {unit} is filled per ingredient.
+CONTEXT_FIELDS = [
+    ('Inventory', 'Alert', 'alert', '{}', 1),
+    ('Inventory', 'Days until depletion', 'days_until_depletion', '{:.1f}', 1),
+    ('Inventory', 'On hand', 'on_hand', '{:,.0f} {unit}', 2),
+    ('Inventory', 'Weekly usage', 'weekly_usage', '{:,.0f} {unit}', 2),
+    ('Inventory', 'Weekly usage (upper 80%)', 'weekly_usage_upper', '{:,.0f} {unit}', 2),
+    ('Forecast', 'Avg next 3 months', 'avg_forecasted_usage', '{:,.0f} {unit}', 1),
+    ('Forecast', 'Change vs history', 'pct_change_from_historical', '{:+.1f}%', 1),
+    ('Forecast', 'Upper 80% (peak month)', 'max_upper_80', '{:,.0f} {unit}', 2),
+    ('Forecast', 'Trend', 'trend_strength', '{}', 2),
+    ('Forecast', 'R²', 'r_squared', '{:.2f}', 3),
+    ('History', 'Avg monthly', 'historical_avg', '{:,.0f} {unit}', 2),
+    ('History', 'Peak', 'peak_usage_hist', '{:,.0f} {unit}', 3),
+    ('History', 'Std dev', 'std_usage', '{:,.0f} {unit}', 3),
+    ('Seasonal', 'Peak month', 'peak_month', '{}', 2),
+    ('Seasonal', 'Low month', 'low_month', '{}', 3),
+    ('Seasonal', 'Variation', 'seasonal_variation_%', '{:.0f}%', 2),
+    ('Shipments', 'Needed per month', 'shipments_needed_per_month', '{:.0f}', 2),
+    ('Shipments', 'Frequency', 'frequency', '{}', 3),
+]
+DETAIL_LEVELS = {3: 'full', 2: 'key fields', 1: 'essentials'}
+
+
+def estimate_tokens(text):
+    """Character-based token estimate"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _plain_alert(alert):
+    """Alert text without its leading status emoji"""
+    return re.sub(r'^\W+', '', alert) if isinstance(alert, str) else alert
+
+
+def ingredient_facts(historical_df, forecast_df, forecast_summary_df, seasonal_df, reorder_df, cost_df):
+    """One row of context facts per ingredient, indexed by ingredient"""
+    history = historical_df[historical_df['data_type'] == 'historical']
+    facts = history.groupby('ingredient')['value'].agg(peak_usage_hist='max', std_usage='std')
+
+    summary = forecast_summary_df.set_index('ingredient')[
+        ['avg_forecasted_usage', 'pct_change_from_historical', 'trend_strength', 'r_squared', 'historical_avg']
+    ]
+    facts = facts.join(summary, how='outer')
+    if 'upper_80' in forecast_df.columns:
+        facts = facts.join(forecast_df.groupby('ingredient')['upper_80'].max().rename('max_upper_80'))
+
+    facts = facts.join(seasonal_df.set_index('ingredient')[['peak_month', 'low_month', 'seasonal_variation_%']])
+
+    reorder = reorder_df.set_index('ingredient')
+    inventory = pd.DataFrame({
+        'alert': reorder['forecasted_alert'].map(_plain_alert),
+        'days_until_depletion': reorder['forecasted_days_until_depletion'],
+        'weekly_usage': reorder['forecasted_weekly_usage'],
+    })
+    # Days until depletion are based on the upper bound, so give it its own label
+    if 'forecasted_weekly_usage_upper' in reorder:
+        inventory['weekly_usage_upper'] = reorder['forecasted_weekly_usage_upper']
+    if 'on_hand' in reorder:
+        inventory['on_hand'] = reorder['on_hand']
+    facts = facts.join(inventory)
+
+    facts = facts.join(cost_df.set_index('ingredient')[['shipments_needed_per_month', 'frequency']])
+    facts.index.name = 'ingredient'
+    return facts
+
+
+def _render_ingredient(name, row, unit, max_priority):
+    """Compact block for one ingredient, fields up to max_priority"""
+    lines = [f"## {name} ({unit})"]
+    section_parts = {}
+    for section, label, col, fmt, priority in CONTEXT_FIELDS:
+        if priority > max_priority or col not in row.index:
+            continue
+        value = row[col]
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            continue
+        section_parts.setdefault(section, []).append(f"{label} {fmt.format(value, unit=unit)}")
+    for section, parts in section_parts.items():
+        lines.append(f"{section}: " + "; ".join(parts))
+    return "\n".join(lines)
+
+
+def _render_summary(rows):
+    """One line covering ingredients left out of the detail blocks"""
+    alerts = rows['alert'].dropna().value_counts() if 'alert' in rows else pd.Series(dtype=int)
+    alert_text = ", ".join(f"{n} {a.split(' - ')[0]}" for a, n in alerts.items())
+    change = rows['pct_change_from_historical'].median() if 'pct_change_from_historical' in rows else np.nan
+    parts = [f"## Other ingredients ({len(rows)}): " + ", ".join(rows.index)]
+    if alert_text:
+        parts.append(f"Alerts: {alert_text}")
+    if not np.isnan(change):
+        parts.append(f"Median forecast change vs history: {change:+.1f}%")
+    return "\n".join(parts)
+
+
+def build_context(facts, ingredients, units=None, budget=DEFAULT_TOKEN_BUDGET, header=None):
+    """Render context for the given ingredients within a token budget
+
+    Returns a dict with the text, its estimated tokens and what was trimmed.
+    Ingredients are ordered most urgent first (fewest days until depletion),
+    so trimming always keeps detail for the ones closest to running out.
+    """
+    units = units or {}
+    header = header or "Restaurant: Mai Shan Yun"
+    rows = facts.reindex([i for i in ingredients if i in facts.index])
+    if 'days_until_depletion' in rows:
+        rows = rows.sort_values('days_until_depletion', na_position='last', kind='stable')
+    names = list(rows.index)
+
+    def render(max_priority, detailed):
+        blocks = [header]
+        blocks += [_render_ingredient(n, rows.loc[n], units.get(n, 'units'), max_priority) for n in names[:detailed]]
+        if detailed < len(names):
+            blocks.append(_render_summary(rows.iloc[detailed:]))
+        return "\n\n".join(blocks)
+
+    # Drop low-value fields first, keeping every ingredient in detail
+    for max_priority in sorted(DETAIL_LEVELS, reverse=True):
+        text = render(max_priority, len(names))
+        if estimate_tokens(text) <= budget:
+            break
+    else:
+        # Still too long: detail for the most urgent, summary line for the rest
+        detailed = len(names) - 1
+        while detailed > 0:
+            text = render(1, detailed)
+            if estimate_tokens(text) <= budget:
+                break
+            detailed -= 1
+        else:
+            text = render(1, 0)
+        return _result(text, budget, 1, names[:detailed], names[detailed:])
+
+    return _result(text, budget, max_priority, names, [])
+
+
+def _result(text, budget, max_priority, detailed, summarized):
+    tokens = estimate_tokens(text)
+    return {
+        'text': text,
+        'tokens': tokens,
+        'budget': budget,
+        'over_budget': tokens > budget,
+        'detail_level': DETAIL_LEVELS[max_priority],
+        'detailed': detailed,
+        'summarized': summarized,
+    }
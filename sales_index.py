@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# SALES RANK INDEXES
+# ============================================================================
+# Everything is laid out as (period x key) matrices and sorted once when the
+# index is built. Top-N, bottom-N, share and growth queries are then slices of
+# the precomputed orderings instead of a sort over every row on each rerun.
+
+ALL_PERIODS = 'All'
+ROLLING_WINDOW = 3
+
+# Item rows in sales_item_monthly.csv carry no category. Items listed in
+# CATEGORY_OVERRIDES are placed first, then matched to a category whose name
+# appears in the item name, then by these keywords.
+CATEGORY_KEYWORDS = {
+    'Fried Chicken': ['chicken wing', 'wing wheel', 'chicken tender', 'cutlet', 'crunch chicken'],
+    'Appetizer': ['dumpling', 'spring roll', 'egg roll', 'rangoon', 'shrimp', 'cucumber',
+                  'french fries', 'bun', 'sesame ball', 'rice cake'],
+    'Drink': ['pepsi', 'soda', 'sprite', 'water', 'ramune', 'milkis', 'crush', 'starry',
+              'lemonade', 'tea', 'kiwi', 'sunrise', 'coconut milk', 'dr. pepper', 'dr pepper'],
+    'Milk Tea': ['boba'],
+    'Additonal': ['braised', 'chunked', 'white rice', 'sauce', 'soup to go', 'exp'],
+}
+OTHER_CATEGORY = 'Other'
+
+# Items whose name would match the wrong category (lowercase item name -> category)
+CATEGORY_OVERRIDES = {
+    # Names the Drink category, but is sold with the other chicken combos
+    'chicken tender combo w fries and drink': 'Fried Chicken',
+}
+
+
+def assign_categories(items, categories, keywords=None, overrides=None):
+    """Map each item name to a menu category"""
+    keywords = CATEGORY_KEYWORDS if keywords is None else keywords
+    overrides = CATEGORY_OVERRIDES if overrides is None else overrides
+    # Longest names first so 'Tossed Ramen' wins over 'Ramen'
+    names = sorted({c for c in categories if isinstance(c, str)}, key=len, reverse=True)
+    mapping = {}
+    for item in pd.unique(items):
+        text = str(item).strip().lower()
+        if text in overrides:
+            mapping[item] = overrides[text]
+            continue
+        match = next((c for c in names if c.lower() in text or c.lower().rstrip('s') in text), None)
+        if match is None:
+            match = next((c for c, words in keywords.items() if any(w in text for w in words)), OTHER_CATEGORY)
+        mapping[item] = match
+    return mapping
+
+
+def item_sales_table(sales_item_df):
+    """Item-level rows with a category column, summed per period and item"""
+    items = sales_item_df[sales_item_df['item'].notna()].copy()
+    categories = sales_item_df['category'].dropna().unique()
+    items['category'] = items['item'].map(assign_categories(items['item'], categories))
+    return (
+        items.groupby(['period', 'category', 'item'])[['count', 'amount']]
+        .sum()
+        .reset_index()
+    )
+
+
+def category_sales_table(sales_item_df, sales_category_df):
+    """Category rows only; the category file also carries menu items as groups"""
+    categories = set(sales_item_df['category'].dropna())
+    return sales_category_df[sales_category_df['group'].isin(categories)]
+
+
+class RankIndex:
+    """Precomputed per-period rankings over a key column"""
+
+    def __init__(self, df, key_col, value_cols=('count', 'amount'), period_col='period', group_col=None):
+        self.key_col = key_col
+        self.group_col = group_col
+
+        wide = {
+            col: df.pivot_table(index=period_col, columns=key_col, values=col, aggfunc='sum')
+            for col in value_cols
+        }
+        first = wide[value_cols[0]]
+        self.periods = [ALL_PERIODS] + list(first.index)
+        self.keys = np.asarray(first.columns, dtype=object)
+        self._period_pos = {p: i for i, p in enumerate(self.periods)}
+
+        if group_col is not None:
+            groups = df.drop_duplicates(key_col).set_index(key_col)[group_col]
+            self.groups = groups.reindex(self.keys).to_numpy(dtype=object)
+        else:
+            self.groups = np.full(len(self.keys), None, dtype=object)
+
+        # Metric matrices: first row is the all-period aggregate
+        self.values = {}
+        for col in value_cols:
+            m = wide[col].reindex(columns=first.columns).to_numpy(dtype=float)
+            monthly = np.nan_to_num(m)
+            growth = np.full_like(m, np.nan)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                growth[1:] = np.where(monthly[:-1] > 0, (monthly[1:] - monthly[:-1]) / monthly[:-1] * 100, np.nan)
+            csum = np.cumsum(monthly, axis=0)
+            rolling = csum.copy()
+            rolling[ROLLING_WINDOW:] = csum[ROLLING_WINDOW:] - csum[:-ROLLING_WINDOW]
+            total = monthly.sum(axis=0, keepdims=True)
+
+            self.values[col] = np.vstack([total, monthly])
+            self.values[f'{col}_growth_%'] = np.vstack([np.full_like(total, np.nan), growth])
+            self.values[f'{col}_rolling_{ROLLING_WINDOW}'] = np.vstack([total, rolling])
+
+        # Period totals for share queries
+        self.totals = {col: self.values[col].sum(axis=1) for col in value_cols}
+
+        # Sorted orderings per metric: descending, invalid entries last
+        self._order = {}
+        self._valid_len = {}
+        for metric, m in self.values.items():
+            is_growth = metric.endswith('_growth_%')
+            valid = ~np.isnan(m) if is_growth else m > 0
+            keyed = np.where(valid, m, -np.inf)
+            order = np.argsort(-keyed, axis=1, kind='stable')
+            self._order[metric] = order
+            self._valid_len[metric] = valid.sum(axis=1)
+
+        # Per-group orderings, as contiguous slices of the global order
+        self._group_order = {}
+        if group_col is not None:
+            for metric, order in self._order.items():
+                per_period = []
+                for p in range(len(self.periods)):
+                    ranked = order[p][:self._valid_len[metric][p]]
+                    ranked_groups = self.groups[ranked]
+                    grouped = {}
+                    for g in pd.unique(ranked_groups):
+                        grouped[g] = ranked[ranked_groups == g]
+                    per_period.append(grouped)
+                self._group_order[metric] = per_period
+
+    def _ranked(self, period, metric, group=None):
+        p = self._period_pos[period]
+        if group is None:
+            return p, self._order[metric][p][:self._valid_len[metric][p]]
+        return p, self._group_order[metric][p].get(group, np.array([], dtype=int))
+
+    def _frame(self, p, idx, metric):
+        base = metric.split('_growth_%')[0].split(f'_rolling_{ROLLING_WINDOW}')[0]
+        frame = pd.DataFrame({
+            self.key_col: self.keys[idx],
+            metric: self.values[metric][p, idx],
+        })
+        if self.group_col is not None:
+            frame.insert(1, self.group_col, self.groups[idx])
+        total = self.totals[base][p]
+        frame['share_%'] = self.values[base][p, idx] / total * 100 if total else np.nan
+        frame['growth_%'] = self.values[f'{base}_growth_%'][p, idx]
+        return frame
+
+    def top(self, period, n, metric='count', group=None):
+        """Highest n keys for a period"""
+        p, ranked = self._ranked(period, metric, group)
+        return self._frame(p, ranked[:n], metric)
+
+    def bottom(self, period, n, metric='count', group=None):
+        """Lowest n keys with a valid value, lowest first"""
+        p, ranked = self._ranked(period, metric, group)
+        return self._frame(p, ranked[::-1][:n], metric)
+
+    def series(self, key, metric='count'):
+        """Per-period values for a single key"""
+        i = int(np.flatnonzero(self.keys == key)[0])
+        return pd.Series(self.values[metric][1:, i], index=self.periods[1:], name=key)
+
+    def groups_for(self, period, metric='count'):
+        """Groups present in a period, largest total first"""
+        p = self._period_pos[period]
+        totals = pd.Series(self.values[metric][p], index=self.groups).groupby(level=0).sum()
+        return list(totals.sort_values(ascending=False).index)
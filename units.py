@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# UNIT REGISTRY
+# ============================================================================
+# Every unit gets a small integer code so conversions are array lookups
+# instead of per-row string parsing. Mass units convert exactly to grams;
+# discrete units (eggs, rolls, pieces, whole onions) collapse to "count".
+# Generic "units" from the BOM has no known dimension and is kept as is.
+
+UNIT_G, UNIT_KG, UNIT_LB, UNIT_OZ = 0, 1, 2, 3
+UNIT_COUNT, UNIT_PCS, UNIT_ROLL, UNIT_EGG, UNIT_ONION = 4, 5, 6, 7, 8
+UNIT_UNITS = 9
+
+UNIT_NAMES = np.array(['g', 'kg', 'lbs', 'oz', 'count', 'pcs', 'rolls', 'eggs', 'whole onion', 'units'])
+
+# Factor from each unit to its canonical unit
+TO_CANONICAL = np.array([1.0, 1000.0, 453.592, 28.3495, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0])
+
+# Canonical unit for each unit
+CANONICAL = np.array([
+    UNIT_G, UNIT_G, UNIT_G, UNIT_G,
+    UNIT_COUNT, UNIT_COUNT, UNIT_COUNT, UNIT_COUNT, UNIT_COUNT,
+    UNIT_UNITS,
+])
+
+# Assumed weight of one discrete unit, same assumptions as BLOCK 7 of the notebook
+GRAMS_PER_UNIT = np.array([1.0, 1000.0, 453.592, 28.3495, np.nan, 100.0, 100.0, 50.0, 150.0, np.nan])
+
+UNIT_ALIASES = {
+    'g': UNIT_G, 'gram': UNIT_G, 'grams': UNIT_G,
+    'kg': UNIT_KG, 'kilogram': UNIT_KG, 'kilograms': UNIT_KG,
+    'lb': UNIT_LB, 'lbs': UNIT_LB, 'pound': UNIT_LB, 'pounds': UNIT_LB,
+    'oz': UNIT_OZ, 'ounce': UNIT_OZ, 'ounces': UNIT_OZ,
+    'count': UNIT_COUNT,
+    'pcs': UNIT_PCS, 'piece': UNIT_PCS, 'pieces': UNIT_PCS,
+    'roll': UNIT_ROLL, 'rolls': UNIT_ROLL,
+    'egg': UNIT_EGG, 'eggs': UNIT_EGG,
+    'whole onion': UNIT_ONION, 'onion': UNIT_ONION, 'onions': UNIT_ONION,
+    'units': UNIT_UNITS, 'unit': UNIT_UNITS,
+}
+
+
+def parse_unit(label):
+    """Resolve a unit label (or a BOM column suffix) to a unit code"""
+    if label is None or pd.isna(label):
+        return UNIT_UNITS
+    label = str(label).strip().lower()
+    if label in UNIT_ALIASES:
+        return UNIT_ALIASES[label]
+    # Fall back to the substring and suffix rules the notebook used
+    if 'lb' in label:
+        return UNIT_LB
+    if 'egg' in label:
+        return UNIT_EGG
+    if 'onion' in label or 'whole' in label:
+        return UNIT_ONION
+    if 'roll' in label:
+        return UNIT_ROLL
+    if 'piece' in label or label.endswith('pcs'):
+        return UNIT_PCS
+    if label.endswith('count'):
+        return UNIT_COUNT
+    if label.endswith('_g') or label.endswith('g'):
+        return UNIT_G
+    return UNIT_UNITS
+
+
+def encode_units(labels):
+    """Vectorized label -> unit code; only the distinct labels are parsed"""
+    codes, uniques = pd.factorize(pd.Series(labels), use_na_sentinel=True)
+    lookup = np.array([parse_unit(u) for u in uniques] + [UNIT_UNITS], dtype=np.int8)
+    # factorize marks missing labels with -1, which indexes the trailing UNIT_UNITS
+    return lookup[codes]
+
+
+def to_canonical(values, codes):
+    """Convert values to their canonical unit, return (values, canonical codes)"""
+    values = np.asarray(values, dtype=float)
+    return values * TO_CANONICAL[codes], CANONICAL[codes]
+
+
+def to_grams(values, codes):
+    """Convert values to grams; NaN where no weight is known for the unit"""
+    return np.asarray(values, dtype=float) * GRAMS_PER_UNIT[codes]
+
+
+def normalize_units(df, value_cols, unit_col='unit'):
+    """Rewrite value columns in canonical units and add a unit_code column"""
+    df = df.copy()
+    codes = encode_units(df[unit_col])
+    factors = TO_CANONICAL[codes]
+    for col in value_cols:
+        df[col] = df[col].to_numpy(dtype=float) * factors
+    df['unit_code'] = CANONICAL[codes]
+    df[unit_col] = UNIT_NAMES[df['unit_code'].to_numpy()]
+    return df
+
+
+def canonical_units_by_ingredient(df, ingredient_col='ingredient', unit_col='unit'):
+    """Most common canonical unit for each ingredient"""
+    codes = CANONICAL[encode_units(df[unit_col])]
+    counts = pd.DataFrame({ingredient_col: df[ingredient_col].to_numpy(), 'unit_code': codes})
+    mode = (
+        counts.groupby([ingredient_col, 'unit_code']).size()
+        .reset_index(name='n')
+        .sort_values('n', ascending=False)
+        .drop_duplicates(ingredient_col)
+        .set_index(ingredient_col)['unit_code']
+    )
+    return mode
+
+
+def sum_by_unit(values, codes):
+    """Sum values separately per unit code, return {unit name: total}"""
+    values = np.asarray(values, dtype=float)
+    codes = np.asarray(codes)
+    valid = ~np.isnan(values)
+    totals = np.bincount(codes[valid], weights=values[valid], minlength=len(UNIT_NAMES))
+    present = np.bincount(codes[valid], minlength=len(UNIT_NAMES)) > 0
+    return {str(UNIT_NAMES[i]): float(totals[i]) for i in np.flatnonzero(present)}
+
+
+def mean_by_unit(values, codes):
+    """Mean of values separately per unit code, return {unit name: mean}"""
+    values = np.asarray(values, dtype=float)
+    codes = np.asarray(codes)
+    valid = ~np.isnan(values)
+    totals = np.bincount(codes[valid], weights=values[valid], minlength=len(UNIT_NAMES))
+    counts = np.bincount(codes[valid], minlength=len(UNIT_NAMES))
+    return {str(UNIT_NAMES[i]): float(totals[i] / counts[i]) for i in np.flatnonzero(counts)}
+
+
+def format_unit_totals(totals, fmt='{:,.0f}'):
+    """Render {unit: value} as '588,308 g · 2,169 count', grams first"""
+    if not totals:
+        return 'N/A'
+    order = sorted(totals, key=lambda u: (u != 'g', u))
+    return ' · '.join(f"{fmt.format(totals[u])} {u}" for u in order)
+
+
+def shipment_quantity_canonical(shipments_df, ingredient_units):
+    """Per-shipment quantity in each ingredient's canonical unit
+
+    Mirrors BLOCK 13 (quantity / number_of_shipments). Shipments whose unit
+    cannot be expressed in the ingredient's canonical unit stay in grams.
+    Returns (quantity, unit_code) arrays aligned with shipments_df.
+    """
+    ship_codes = encode_units(shipments_df['unit_of_shipment'])
+    qty, ship_canonical = to_canonical(shipments_df['quantity_per_shipment'], ship_codes)
+    target = shipments_df['ingredient_norm'].map(ingredient_units).to_numpy()
+    grams = shipments_df['quantity_in_grams'].to_numpy(dtype=float)
+
+    use_native = (ship_canonical == target) & (ship_canonical != UNIT_G)
+    quantity = np.where(use_native, qty, grams)
+    unit_code = np.where(use_native, ship_canonical, UNIT_G)
+    return quantity / shipments_df['number_of_shipments'].to_numpy(dtype=float), unit_code